@@ -0,0 +1,201 @@
+import logging
+import glob
+import os
+import json
+import random
+import time
+import argparse
+import sys
+import numpy as np
+
+import main
+import generate_instance
+from timetable import Timetable
+from simulator.simulator import Simulator
+from simulator.simulator import BlockinException
+from simulator.qtable import QTable, get_state_id
+
+logger = logging.getLogger()
+logger.setLevel(logging.WARNING)
+
+FORMAT = "[%(asctime)s %(filename)s:%(lineno)s - %(funcName)s ] %(message)s"
+logging.basicConfig(format=FORMAT)
+
+# seconds of simulation undone by the go_back benchmarks
+GO_BACK_DEPTHS = [60, 10 * 60, 60 * 60]
+
+
+def best_time(function, repeat, number=1):
+    """
+    lowest wall clock time of repeat runs of a benchmark. function() does the setup of a run and returns the
+    callable to time, called number times per run
+    """
+    times = []
+    for _ in range(repeat):
+        timed = function()
+        start = time.perf_counter()
+        for _ in range(number):
+            timed()
+        times.append((time.perf_counter() - start) / number)
+    return min(times)
+
+
+def reset(sim, args, seed):
+    """
+    empty qtable and priorities, so that every episode starts from the same state
+    """
+    random.seed(seed)
+    sim.qtable = QTable()
+    sim.qtable.epsilon = args.epsilon
+    sim.qtable.alpha = args.alpha
+    sim.qtable.gamma = args.gamma
+    sim.priorities = {}
+
+
+def create_simulator(path, args, seed):
+    """
+    prepared simulator, set up by main.py with args
+    """
+    sim = main.create_simulator(path, args, QTable())
+    reset(sim, args, seed)
+    return sim
+
+
+def run_episode(sim, max_backs=2000):
+    sim.initialize()
+    sim.free_all_resources()
+    n = 0
+    while not sim.done and n < max_backs:
+        try:
+            sim.run()
+        except BlockinException as e:
+            n += 1
+            sim.go_back(e.back_time)
+
+
+def benchmark_instance(path, args, seed, repeat):
+    """
+    times the steps of loading an instance and running it with the settings of main.py in args,
+    returns {name: seconds}
+    """
+    results = {}
+
+    def load():
+        return lambda: Timetable(json_path=path)
+    results["load"] = best_time(load, repeat)
+
+    def compile_timetable():
+        timetable = Timetable(json_path=path)
+        return timetable.compile
+    results["compile"] = best_time(compile_timetable, repeat)
+
+    for step in ["assign_limit", "spiegel_anschlusse", "match_trains"]:
+        def prepare_step():
+            sim = Simulator(path=path, qtable=None)
+            # match_trains needs the limits
+            if step == "match_trains":
+                sim.assign_limit()
+            return getattr(sim, step)
+        results[step] = best_time(prepare_step, repeat)
+
+    sim = create_simulator(path, args, seed)
+
+    def episode():
+        reset(sim, args, seed)
+        return lambda: run_episode(sim)
+    results["episode"] = best_time(episode, repeat)
+
+    for depth in GO_BACK_DEPTHS:
+        def go_back():
+            reset(sim, args, seed)
+            run_episode(sim)
+            return lambda: sim.go_back(max(0, sim.current_time - depth))
+        results["go_back_%is" % depth] = best_time(go_back, repeat)
+
+    reset(sim, args, seed)
+    run_episode(sim)
+
+    def compute_score():
+        return sim.compute_score
+    results["compute_score"] = best_time(compute_score, repeat, number=100)
+
+    # at the end of the day every train is on its last section with nothing ahead of it, the states are
+    # sampled in the middle of the day instead
+    entry_times = [s.entry_time for t in sim.trains for s in t.solution.sections if np.isfinite(s.entry_time)]
+    sim.go_back((min(entry_times) + max(entry_times)) // 2)
+
+    def state_ids():
+        return lambda: [get_state_id(t, sim.n_state) for t in sim.trains]
+    results["get_state_id"] = best_time(state_ids, repeat, number=100)
+    return results
+
+
+def compare(results, baseline, tolerance, min_time):
+    """
+    names of the benchmarks slower than their baseline by more than tolerance. Benchmarks faster than min_time
+    are too noisy to be flagged
+    """
+    regressions = []
+    for name, seconds in sorted(results.items()):
+        if name not in baseline:
+            continue
+        ratio = seconds / baseline[name] if baseline[name] > 0 else 1.0
+        flag = ""
+        if ratio > 1 + tolerance and seconds > min_time:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print("%-50s %10.4fs  baseline %10.4fs  x%.2f%s" % (name, seconds, baseline[name], ratio, flag))
+    return regressions
+
+
+def get_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--instances", default="inputs/*.json", help="glob of the problem instances")
+    parser.add_argument("--generated", default="600",
+                        help="comma separated numbers of trains of generated instances to benchmark as well, with "
+                             "the default settings of generate_instance.py. Empty for none")
+    parser.add_argument("--seed", default=2018, type=int)
+    parser.add_argument("--repeat", default=3, type=int, help="runs per benchmark, the fastest is kept")
+    parser.add_argument("--baseline", default="benchmark_baseline.json")
+    parser.add_argument("--save", action="store_true", help="save the results as the new baseline")
+    parser.add_argument("--tolerance", default=0.2, type=float, help="slowdown flagged as a regression")
+    parser.add_argument("--min_time", default=0.005, type=float, help="seconds under which nothing is flagged")
+    return parser
+
+
+if __name__ == "__main__":
+    args = get_parser().parse_args()
+
+    # the default settings of main.py, so that the benchmarks follow what main.py runs
+    main_args = main.get_parser().parse_args([])
+
+    paths = sorted(glob.glob(args.instances))
+    # the given instances are small, a generated tier with a fixed seed shows how the steps scale
+    generator_args = generate_instance.get_parser().parse_args([])
+    for n_trains in filter(None, args.generated.split(",")):
+        generator_args.trains = int(n_trains)
+        instance = generate_instance.create_generator(generator_args).create()
+        paths.append(generate_instance.write(instance))
+
+    results = {}
+    for path in paths:
+        label = os.path.splitext(os.path.basename(path))[0]
+        for name, seconds in benchmark_instance(path, main_args, args.seed, args.repeat).items():
+            results["%s/%s" % (label, name)] = seconds
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.save or not baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        for name, seconds in sorted(results.items()):
+            print("%-50s %10.4fs" % (name, seconds))
+        print("baseline saved to %s" % args.baseline)
+    else:
+        regressions = compare(results, baseline, args.tolerance, args.min_time)
+        if regressions:
+            print("%i regressions" % len(regressions))
+            sys.exit(1)
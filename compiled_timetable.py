@@ -0,0 +1,130 @@
+import numpy as np
+
+MAX_TIME = 24 * 60 * 60
+
+REQUIREMENT_DTYPE = np.dtype([
+    ("train", np.int32),
+    ("entry_earliest", np.float64),
+    ("entry_latest", np.float64),
+    ("exit_earliest", np.float64),
+    ("exit_latest", np.float64),
+    ("min_stopping_time", np.float64),
+    ("entry_delay_weight", np.float64),
+    ("exit_delay_weight", np.float64),
+])
+
+
+def to_ptr(counts):
+    ptr = np.zeros(len(counts) + 1, dtype=np.int64)
+    ptr[1:] = np.cumsum(counts)
+    return ptr
+
+
+def to_csr(lists):
+    """
+    packs a list of lists of ints into (ptr, idx) arrays: the items of row i are idx[ptr[i]:ptr[i + 1]]
+    """
+    ptr = to_ptr([len(l) for l in lists])
+    idx = np.fromiter((i for l in lists for i in l), dtype=np.int32, count=ptr[-1])
+    return ptr, idx
+
+
+class CompiledTimetable(object):
+    """
+    integer indexed view of a loaded timetable.
+    Trains, sections, nodes, resources and requirements get dense ids, also stored as ``index`` on the objects,
+    and their numeric data is kept in numpy arrays.
+    """
+
+    def __init__(self, timetable):
+        self.trains = list(timetable.trains.values())
+        self.resources = list(timetable.resources.values())
+        self.sections = []
+        self.nodes = []
+        self.requirements = []
+
+        for train in self.trains:
+            self.sections += train.get_sections()
+            self.nodes += train.network.nodes.values()
+            self.requirements += train.get_requirements()
+
+        for objects in [self.trains, self.resources, self.sections, self.nodes, self.requirements]:
+            for i, o in enumerate(objects):
+                o.index = i
+        # position of each section in the out links of its start node
+        for node in self.nodes:
+            for i, section in enumerate(node.out_links):
+                section.slot = i
+
+        self.train_section_ptr = to_ptr([len(t.network.sections) for t in self.trains])
+        self.train_node_ptr = to_ptr([len(t.network.nodes) for t in self.trains])
+        self.train_requirement_ptr = to_ptr([len(t.get_requirements()) for t in self.trains])
+        self.train_start_node = np.array([t.network.nodes["start"].index for t in self.trains], dtype=np.int32)
+        self.train_end_node = np.array([t.network.nodes["end"].index for t in self.trains], dtype=np.int32)
+        self.train_depot_node = np.array([t.network.nodes["depot"].index for t in self.trains], dtype=np.int32)
+
+        self.resource_release_time = np.array([r.get_release_time() for r in self.resources], dtype=np.float64)
+
+        self.section_train = np.array([s.train.index for s in self.sections], dtype=np.int32)
+        self.section_start_node = np.array([s.start_node.index for s in self.sections], dtype=np.int32)
+        self.section_end_node = np.array([s.end_node.index for s in self.sections], dtype=np.int32)
+        self.section_min_running_time = np.array([s.get_minimum_running_time() for s in self.sections],
+                                                 dtype=np.float64)
+        self.section_penalty = np.array([s.get_penalty() for s in self.sections], dtype=np.float64)
+        self.section_requirement = np.array(
+            [-1 if s.get_requirement() is None else s.get_requirement().index for s in self.sections], dtype=np.int32)
+        self.section_resource_ptr, self.section_resource_idx = to_csr(
+            [[timetable.resources[o.get_resource_id()].index for o in s.get_occupations()] for s in self.sections])
+
+        self.node_train = np.array([t.index for t in self.trains for _ in t.network.nodes], dtype=np.int32)
+        self.node_out_ptr, self.node_out_idx = to_csr([[s.index for s in n.out_links] for n in self.nodes])
+        self.node_in_ptr, self.node_in_idx = to_csr([[s.index for s in n.in_links] for n in self.nodes])
+
+        self.requirement_table = np.array(
+            [(r.train.index, r.get_entry_earliest(), r.get_entry_latest(), r.get_exit_earliest(), r.get_exit_latest(),
+              r.get_min_stopping_time(), r.get_entry_delay_weight(), r.get_exit_delay_weight())
+             for r in self.requirements], dtype=REQUIREMENT_DTYPE)
+
+    def get_section_resources(self, section_id):
+        return self.section_resource_idx[self.section_resource_ptr[section_id]:self.section_resource_ptr[section_id + 1]]
+
+    def get_out_sections(self, node_id):
+        return self.node_out_idx[self.node_out_ptr[node_id]:self.node_out_ptr[node_id + 1]]
+
+    def get_in_sections(self, node_id):
+        return self.node_in_idx[self.node_in_ptr[node_id]:self.node_in_ptr[node_id + 1]]
+
+    def get_train_sections(self, train_id):
+        return np.arange(self.train_section_ptr[train_id], self.train_section_ptr[train_id + 1])
+
+    def get_train_requirements(self, train_id):
+        return np.arange(self.train_requirement_ptr[train_id], self.train_requirement_ptr[train_id + 1])
+
+    def compute_objective(self, solutions):
+        """
+        objective of each train for the solutions of all the trains, as Solution.compute_objective.
+        Returns an array indexed by train id
+        """
+        sections = [s for solution in solutions for s in solution.sections]
+        n = len(sections)
+        section_ids = np.fromiter((s.section.index for s in sections), dtype=np.int64, count=n)
+        entry_times = np.fromiter((s.entry_time for s in sections), dtype=np.float64, count=n)
+        exit_times = np.fromiter((s.exit_time for s in sections), dtype=np.float64, count=n)
+
+        # time of the section fulfilling each requirement, the last one wins as in Solution.compute_objective
+        requirement_ids = self.section_requirement[section_ids]
+        mask = requirement_ids >= 0
+        requirement_entry = np.full(len(self.requirements), MAX_TIME, dtype=np.float64)
+        requirement_exit = np.full(len(self.requirements), MAX_TIME, dtype=np.float64)
+        requirement_entry[requirement_ids[mask]] = entry_times[mask]
+        requirement_exit[requirement_ids[mask]] = exit_times[mask]
+
+        table = self.requirement_table
+        delays = table["entry_delay_weight"] * np.maximum(0, requirement_entry - table["entry_latest"]) + \
+            table["exit_delay_weight"] * np.maximum(0, requirement_exit - table["exit_latest"])
+
+        n_trains = len(self.trains)
+        objective = 1 / 60.0 * np.bincount(table["train"], weights=delays, minlength=n_trains)
+        objective += np.bincount(self.section_train[section_ids], weights=self.section_penalty[section_ids],
+                                 minlength=n_trains)
+        return objective
@@ -0,0 +1,271 @@
+"""
+writes a synthetic problem instance in the schema of the challenge.
+The network is a line of stations. Between two stations the line is cut in blocks, on one or more parallel
+tracks. A station has a throat on each side and some platforms: the platforms are alternative route paths,
+joined to the standard path by route alternative markers.
+
+A train runs in either direction between two stations, stops at some stations in between, and may have to wait
+for a connection with an earlier train at one of its stops.
+"""
+
+import os
+import json
+import random
+import argparse
+import zlib
+
+from simulator.event import humanize_time
+
+DAY_START = 5 * 60 * 60
+DAY_END = 22 * 60 * 60
+
+
+def duration(seconds):
+    return "PT%iM%iS" % divmod(int(seconds), 60)
+
+
+class Generator(object):
+    def __init__(self, n_trains, n_stations, n_platforms, n_tracks, n_blocks, overlap, span, stop_probability,
+                 slack, connection_probability, seed):
+        self.n_trains = n_trains
+        self.n_stations = n_stations
+        # route branching: alternative platforms a train can use at each station
+        self.n_platforms = n_platforms
+        # resource sharing: parallel tracks between stations and resources occupied by each block section
+        self.n_tracks = n_tracks
+        self.n_blocks = n_blocks
+        self.overlap = overlap
+        # longest run of a train, in stations
+        self.span = span
+        self.stop_probability = stop_probability
+        # time window tightness: seconds between the nominal and the latest times
+        self.slack = slack
+        self.connection_probability = connection_probability
+        self.seed = seed
+        self.random = random.Random(seed)
+
+        # longest run which fits in the day window with the longest stops: a station takes at most
+        # 20 + 30 + 120 + 20 s and the line to the next one 90 s per block
+        station_time = 190 + 90 * n_blocks
+        fitting = (DAY_END - DAY_START - slack) // station_time - 1
+        if n_stations < 1:
+            raise ValueError("at least one station is needed")
+        if fitting < 0:
+            raise ValueError("no train fits in the day window with %i s of slack and %i blocks" % (slack, n_blocks))
+        # with a single station, or a short day window, trains stay in their first station
+        self.max_length = min(span, n_stations - 1, fitting)
+
+        # running time of each block, the same for all trains
+        self.block_times = [[self.random.randint(30, 90) for _ in range(n_blocks)] for _ in range(n_stations - 1)]
+
+    def get_label(self):
+        return "generated_%i_%i" % (self.n_trains, self.seed)
+
+    def create_resources(self):
+        ids = []
+        for k in range(self.n_stations):
+            ids.append("S%i_W" % k)
+            ids += ["S%i_P%i" % (k, p) for p in range(self.n_platforms)]
+        for k in range(self.n_stations - 1):
+            for t in range(self.n_tracks):
+                ids += ["L%i_B%i_T%i" % (k, b, t) for b in range(self.n_blocks)]
+        return [{"id": i, "release_time": "PT30S", "following_allowed": False} for i in ids]
+
+    def create_train(self, train_id):
+        """
+        service intention and route of one train, with its nominal times
+        """
+        length = self.random.randint(min(1, self.max_length), self.max_length)
+        first = self.random.randint(0, self.n_stations - 1 - length)
+        stations = list(range(first, first + length + 1))
+        forward = self.random.random() < 0.5
+        if not forward:
+            stations.reverse()
+        # directions use their own track when there are several
+        track = (0 if forward else 1) % self.n_tracks
+
+        sequence = [0]
+
+        def section(resources, running_time, starting_point, ending_point, marker=None, entry=None, exit=None):
+            sequence[0] += 1
+            s = {"sequence_number": sequence[0],
+                 "resource_occupations": [{"resource": r, "occupation_direction": None} for r in resources],
+                 "penalty": 0,
+                 "starting_point": starting_point,
+                 "ending_point": ending_point,
+                 "minimum_running_time": duration(running_time)}
+            # only the sections which may fulfil a requirement are marked
+            if marker is not None:
+                s["section_marker"] = [marker]
+            if entry is not None:
+                s["route_alternative_marker_at_entry"] = [entry]
+            if exit is not None:
+                s["route_alternative_marker_at_exit"] = [exit]
+            return s
+
+        standard = []
+        alternatives = []
+        halts = []
+        time = 0
+        for i, k in enumerate(stations):
+            throat = "S%i_W" % k
+            stop = i == 0 or (i < len(stations) - 1 and self.random.random() < self.stop_probability)
+
+            # entry throat, platforms, exit throat
+            standard.append(section([throat], 20, "S%i" % k, "S%i_in" % k, marker="S%i_E" % k, exit="S%i_in" % k))
+            time += 20
+            arrival = time
+            standard.append(section(["S%i_P0" % k], 30, "S%i_in" % k, "S%i_out" % k, marker="S%i_Halt" % k,
+                                    entry="S%i_in" % k, exit="S%i_out" % k))
+            for p in range(1, self.n_platforms):
+                alternatives.append({"id": "S%i_P%i" % (k, p), "route_sections": [
+                    section(["S%i_P%i" % (k, p)], 30, "S%i_in" % k, "S%i_out" % k, marker="S%i_Halt" % k,
+                            entry="S%i_in" % k, exit="S%i_out" % k)]})
+            time += 30
+            if stop:
+                stopping_time = self.random.randint(30, 120)
+                time += stopping_time
+                halts.append((k, arrival, time, stopping_time))
+            standard.append(section([throat], 20, "S%i_out" % k, "S%i" % k, marker="S%i_X" % k, entry="S%i_out" % k))
+            time += 20
+
+            if i < len(stations) - 1:
+                line = min(k, stations[i + 1])
+                blocks = list(range(self.n_blocks))
+                if not forward:
+                    blocks.reverse()
+                for n, b in enumerate(blocks):
+                    occupied = blocks[n:n + self.overlap]
+                    points = ["L%i_%i" % (line, b), "L%i_%i" % (line, b + 1)]
+                    if not forward:
+                        points.reverse()
+                    standard.append(section(["L%i_B%i_T%i" % (line, o, track) for o in occupied],
+                                            self.block_times[line][b], *points))
+                    time += self.block_times[line][b]
+
+        route = {"id": train_id,
+                 "route_paths": [{"id": "standard", "route_sections": standard}] + alternatives}
+        return route, stations, halts, time
+
+    def create_requirements(self, start, stations, halts, end):
+        requirements = [{"sequence_number": 1,
+                         "section_marker": "S%i_E" % stations[0],
+                         "type": "start",
+                         "entry_earliest": humanize_time(start),
+                         "entry_delay_weight": 1,
+                         "exit_delay_weight": 1,
+                         "connections": None}]
+        for k, arrival, departure, stopping_time in halts:
+            requirements.append({"sequence_number": len(requirements) + 1,
+                                 "section_marker": "S%i_Halt" % k,
+                                 "type": "halt",
+                                 "min_stopping_time": duration(stopping_time),
+                                 "entry_latest": humanize_time(start + arrival + self.slack),
+                                 "entry_delay_weight": 1,
+                                 "exit_earliest": humanize_time(start + departure),
+                                 "exit_delay_weight": 1,
+                                 "connections": None})
+        requirements.append({"sequence_number": len(requirements) + 1,
+                             "section_marker": "S%i_X" % stations[-1],
+                             "type": "ende",
+                             "exit_latest": humanize_time(start + end + self.slack),
+                             "entry_delay_weight": 1,
+                             "exit_delay_weight": 1,
+                             "connections": None})
+        return requirements
+
+    def add_connections(self, stops):
+        """
+        connections from a train to a later one stopping at the same station a few minutes after it.
+        Connections only go forward in time, so that no train waits for itself
+        """
+        by_station = {}
+        for train_id, k, arrival, requirement in stops:
+            by_station.setdefault(k, []).append((arrival, train_id, requirement))
+
+        for k, trains in by_station.items():
+            trains.sort()
+            for i, (arrival, train_id, requirement) in enumerate(trains):
+                if self.random.random() >= self.connection_probability:
+                    continue
+                later = [t for t in trains[i + 1:] if 5 * 60 <= t[0] - arrival <= 20 * 60 and t[1] != train_id]
+                if not later:
+                    continue
+                _, onto, _ = self.random.choice(later)
+                requirement["connections"] = [{"id": "%s_%s" % (train_id, onto),
+                                               "onto_service_intention": onto,
+                                               "onto_section_marker": "S%i_Halt" % k,
+                                               "min_connection_time": "PT2M"}]
+
+    def create(self):
+        service_intentions = []
+        routes = []
+        stops = []
+        for n in range(self.n_trains):
+            train_id = 100000 + n
+            route, stations, halts, end = self.create_train(train_id)
+            start = self.random.randint(DAY_START, DAY_END - end - self.slack)
+            requirements = self.create_requirements(start, stations, halts, end)
+            for (k, arrival, _, _), requirement in zip(halts, requirements[1:-1]):
+                # the first stop is the departure, nothing to connect to
+                if k != stations[0]:
+                    stops.append((train_id, k, start + arrival, requirement))
+
+            service_intentions.append({"id": train_id, "route": train_id, "section_requirements": requirements})
+            routes.append(route)
+
+        self.add_connections(stops)
+
+        scenario = {"service_intentions": service_intentions,
+                    "routes": routes,
+                    "resources": self.create_resources(),
+                    "parameters": {"maxBandabweichung": "PT5M"}}
+        # read by the instance cache, it has to change with the generated content, not only the parameters.
+        # It comes first, so that the cache finds it at the head of the file
+        instance = {"label": self.get_label(),
+                    "hash": zlib.crc32(json.dumps(scenario, sort_keys=True).encode())}
+        instance.update(scenario)
+        return instance
+
+
+def get_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trains", default=60, type=int)
+    parser.add_argument("--stations", default=20, type=int)
+    parser.add_argument("--platforms", default=2, type=int, help="alternative platforms per station")
+    parser.add_argument("--tracks", default=2, type=int, help="parallel tracks between stations")
+    parser.add_argument("--blocks", default=4, type=int, help="blocks between two stations")
+    parser.add_argument("--overlap", default=1, type=int, help="blocks occupied by each block section")
+    parser.add_argument("--span", default=8, type=int, help="longest run of a train, in stations")
+    parser.add_argument("--stops", default=0.5, type=float, help="probability to stop at a station")
+    parser.add_argument("--slack", default=10 * 60, type=int, help="seconds between nominal and latest times")
+    parser.add_argument("--connections", default=0.05, type=float, help="probability of a connection at a stop")
+    parser.add_argument("--seed", default=2018, type=int)
+    parser.add_argument("--output", default=None, help="defaults to inputs/generated/<label>.json")
+    return parser
+
+
+def create_generator(args):
+    return Generator(n_trains=args.trains, n_stations=args.stations, n_platforms=args.platforms,
+                     n_tracks=args.tracks, n_blocks=args.blocks, overlap=args.overlap, span=args.span,
+                     stop_probability=args.stops, slack=args.slack, connection_probability=args.connections,
+                     seed=args.seed)
+
+
+def write(instance, output=None):
+    """
+    writes instance to output, inputs/generated/<label>.json by default, and returns its path
+    """
+    output = output or os.path.join("inputs", "generated", instance["label"] + ".json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(instance, f, indent=1)
+    return output
+
+
+if __name__ == "__main__":
+    args = get_parser().parse_args()
+    instance = create_generator(args).create()
+    output = write(instance, args.output)
+    print("%s: %i trains, %i resources" % (output, len(instance["service_intentions"]), len(instance["resources"])))
@@ -0,0 +1,104 @@
+import os
+import re
+import sys
+import pickle
+import shutil
+import logging
+
+import numpy as np
+
+from compiled_timetable import CompiledTimetable
+
+# to bump whenever the model classes or the preparation of an instance change, old caches are then ignored
+CACHE_VERSION = 5
+
+HASH_PATTERN = re.compile(rb'"hash"\s*:\s*(-?\d+)')
+
+
+def read_hash(path, chunk_size=1 << 20):
+    """
+    hash of a problem instance, read without parsing the file. None if it is not there.
+    The hash is usually in the head of the file, otherwise the file is scanned chunk by chunk
+    """
+    tail = b""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                match = HASH_PATTERN.search(tail)
+                return int(match.group(1)) if match else None
+            # a match may span two chunks: keep the end of the previous one, but not a number cut at its end
+            data = tail + chunk
+            match = HASH_PATTERN.search(data)
+            if match is not None and match.end() < len(data):
+                return int(match.group(1))
+            tail = data[-64:]
+
+
+def get_cache_folder(cache_dir, instance_hash):
+    return os.path.join(cache_dir, "v%i" % CACHE_VERSION, str(instance_hash))
+
+
+def save(cache_dir, path, timetable, compiled):
+    """
+    saves a prepared instance: the model objects are pickled, the arrays of the compiled timetable are saved as .npy
+    files so that they can be memory mapped.
+    Nothing is saved if load would not find the instance by the hash read from path
+    """
+    if timetable.hash is None or read_hash(path) != timetable.hash:
+        logging.warning("%s can not be cached, its hash is not found" % path)
+        return
+    folder = get_cache_folder(cache_dir, timetable.hash)
+    tmp_folder = "%s.tmp%i" % (folder, os.getpid())
+    os.makedirs(tmp_folder, exist_ok=True)
+
+    arrays = {k: v for k, v in compiled.__dict__.items() if isinstance(v, np.ndarray)}
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_folder, name + ".npy"), array)
+    compiled_state = {k: v for k, v in compiled.__dict__.items() if k not in arrays}
+
+    # the networks are linked lists of nodes and sections, pickled recursively
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, 100000))
+    try:
+        with open(os.path.join(tmp_folder, "instance.pickle"), "wb") as f:
+            pickle.dump((timetable, compiled_state, sorted(arrays)), f, protocol=pickle.HIGHEST_PROTOCOL)
+    finally:
+        sys.setrecursionlimit(limit)
+
+    # another process may have saved the same instance meanwhile
+    try:
+        os.replace(tmp_folder, folder)
+    except OSError:
+        shutil.rmtree(tmp_folder, ignore_errors=True)
+    logging.info("instance cached in %s" % folder)
+
+
+def load(cache_dir, path):
+    """
+    prepared (timetable, compiled timetable) of the instance at path, or None if it is not cached
+    """
+    instance_hash = read_hash(path)
+    if instance_hash is None:
+        return None
+    folder = get_cache_folder(cache_dir, instance_hash)
+    pickle_path = os.path.join(folder, "instance.pickle")
+    if not os.path.exists(pickle_path):
+        return None
+
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, 100000))
+    try:
+        with open(pickle_path, "rb") as f:
+            timetable, compiled_state, array_names = pickle.load(f)
+    finally:
+        sys.setrecursionlimit(limit)
+
+    compiled = CompiledTimetable.__new__(CompiledTimetable)
+    compiled.__dict__.update(compiled_state)
+    for name in array_names:
+        # a plain ndarray view of the map, numpy.memmap adds overhead to each operation
+        array = np.load(os.path.join(folder, name + ".npy"), mmap_mode="r")
+        setattr(compiled, name, array.view(np.ndarray))
+    logging.info("instance loaded from %s" % folder)
+    return timetable, compiled
@@ -1,5 +1,4 @@
 import logging
-import sys
 import numpy as np
 import glob
 import os
@@ -14,7 +13,9 @@ from collections import defaultdict
 
 from simulator.simulator import Simulator
 from simulator.simulator import BlockinException
+from simulator.simulator import StopException
 from simulator.qtable import QTable
+from simulator.stats import Stats
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -22,32 +23,18 @@ logger.setLevel(logging.INFO)
 FORMAT = "[%(asctime)s %(filename)s:%(lineno)s - %(funcName)s ] %(message)s"
 logging.basicConfig(format=FORMAT)
 
-if __name__ == "__main__":
-
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--no", default="06")
-    parser.add_argument("--wait", default=10, type=int)
-    parser.add_argument("--max_delta", default=60, type=int)
-    parser.add_argument("--min_delta", default=60, type=int)
-    parser.add_argument("--n_state", default=1, type=int)
-    parser.add_argument("--epsilon", default=0.1, type=float)
-    parser.add_argument("--alpha", default=0.8, type=float)
-    parser.add_argument("--gamma", default=0.8, type=float)
-    parser.add_argument("--seed", default=2018, type=int)
-
-    args = parser.parse_args()
-    no = args.no
-
-    #path = glob.glob(r"/Users/denism/work/train-schedule-optimisation-challenge-starter-kit/problem_instances/" + no + "*")[0]
-    path = glob.glob(r"inputs/" + no + "*")[0]
+# seconds given to an instance
+TIME_BUDGET = 2 * 15 * 60
 
-    qtable = QTable()
 
-    sim = Simulator(path=path, qtable=qtable)
+def create_simulator(path, args, qtable):
+    sim = Simulator(path=path, qtable=qtable, cache_dir=args.cache_dir)
     sim.trains = sim.trains
-    sim.assign_limit()
+    sim.prepare()
 
     sim.wait_time = args.wait
+    sim.wake_on_release = not args.polling
+    sim.wake_on_connection = not args.polling
     sim.max_delta = args.max_delta
     sim.min_delta = args.min_delta
     sim.n_state = args.n_state
@@ -63,35 +50,35 @@ if __name__ == "__main__":
 
     sim.initialize()
     sim.assign_sections_to_resources()
-    sim.spiegel_anschlusse()
-    sim.match_trains()
+    return sim
 
-    score = np.inf
-    random.seed(args.seed)
 
-    logging.info("problem %s" % path)
-    logging.info("with backward %s" % sim.backward)
-
-    start_time = time.time()
-
-    folder = r"outputs/"
-    output_folder = os.path.join(folder, sim.timetable.label.replace("/", "_"))
-    if not os.path.exists(output_folder):
-        os.mkdir(output_folder)
+def run_episodes(sim, report, should_stop, n_episodes=200, on_episode=None):
+    """
+    runs episodes, going back on blocking, until n_episodes have been run or should_stop() is True.
+    should_stop is also polled by the simulator while it runs.
+    report(score) is called for each score better than the previous ones, on_episode(episode, score) after
+    each episode. Returns the best score
+    """
+    score = np.inf
+    sim.should_stop = should_stop
 
     i = 1
     sub_tour = 1000000
-    while i < 200:
+    while i < n_episodes:
         sim.initialize()
         sim.free_all_resources()
         i += 1
         j = 1
         last_n = None
+        episode_score = np.inf
         #sim.qtable.to_avoid = defaultdict(list)
         while not sim.done and j < sub_tour:
             try:
-                if (time.time()-start_time) > 2*15*60:
-                    sys.exit()
+                if should_stop():
+                    if on_episode is not None:
+                        on_episode(i - 1, episode_score)
+                    return score
 
                 if not sim.backward:
                     sim.initialize()
@@ -100,15 +87,18 @@ if __name__ == "__main__":
                 sim.run()
 
                 _score = sim.compute_score()
-                if sim.compute_score() < score:
+                episode_score = min(episode_score, _score)
+                if _score < score:
                     score = _score
-                    output_path = os.path.join(output_folder, "%f.json" % score)
-                    with open(output_path, 'w') as outfile:
-                        json.dump([sim.create_output()], outfile)
+                    report(score)
                     if score == 0.0:
                         break
 
                 #sim.wait_time = max(1.0, sim.wait_time - 5)
+            except StopException:
+                if on_episode is not None:
+                    on_episode(i - 1, episode_score)
+                return score
             except BlockinException as e:
 
                 #delays = [t.solution.get_delays() for t in sim.trains]
@@ -125,4 +115,101 @@ if __name__ == "__main__":
             #logging.info("resetting")
             #sim.wait_time = max(1.0, sim.wait_time - 5)
             #logging.info(sim.wait_time)
+        if on_episode is not None:
+            on_episode(i - 1, episode_score)
+    return score
+
+
+def get_output_folder(sim):
+    folder = r"outputs/"
+    output_folder = os.path.join(folder, sim.timetable.label.replace("/", "_"))
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder, exist_ok=True)
+    return output_folder
+
+
+def solve(path, args, qtable, seed):
+    sim = create_simulator(path, args, qtable)
+
+    if args.qtable_dir is not None:
+        sim.load_qtable(args.qtable_dir)
+
+    random.seed(seed)
+
+    logging.info("problem %s" % path)
+    logging.info("with backward %s" % sim.backward)
+
+    start_time = time.time()
+    output_folder = get_output_folder(sim)
+
+    def report(score):
+        output_path = os.path.join(output_folder, "%f.json" % score)
+        with open(output_path, 'w') as outfile:
+            json.dump([sim.create_output()], outfile)
+        if args.qtable_dir is not None:
+            sim.save_qtable(args.qtable_dir)
+
+    def should_stop():
+        return (time.time() - start_time) > TIME_BUDGET
+
+    on_episode = None
+    if args.stats is not None:
+        stats = Stats()
+        stats.attach(sim)
+        stats_file = open(args.stats, "a")
+        episode_start = [time.time()]
+
+        def on_episode(episode, score):
+            now = time.time()
+            stats.dump(stats_file, instance=sim.timetable.label, seed=seed, episode=episode, score=score,
+                       seconds=now - episode_start[0])
+            stats.reset()
+            episode_start[0] = now
+
+    run_episodes(sim, report=report, should_stop=should_stop, on_episode=on_episode)
+
+    if args.stats is not None:
+        stats_file.close()
+
+    if args.qtable_dir is not None:
+        sim.save_qtable(args.qtable_dir)
+
+
+def get_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--no", default="06")
+    parser.add_argument("--wait", default=10, type=int)
+    parser.add_argument("--max_delta", default=60, type=int)
+    parser.add_argument("--min_delta", default=60, type=int)
+    parser.add_argument("--n_state", default=1, type=int)
+    parser.add_argument("--epsilon", default=0.1, type=float)
+    parser.add_argument("--alpha", default=0.8, type=float)
+    parser.add_argument("--gamma", default=0.8, type=float)
+    parser.add_argument("--seed", default=2018, type=int)
+    parser.add_argument("--polling", action="store_true", help="re-check blocked trains every --wait seconds")
+    parser.add_argument("--qtable_dir", default=None, help="folder to warm start from and save the qtable to")
+    parser.add_argument("--workers", default=1, type=int, help="processes learning in one shared qtable")
+    parser.add_argument("--shared_states", default=None, type=int,
+                        help="number of states of the shared qtable, sized from the instance by default")
+    parser.add_argument("--stats", default=None, help="JSON lines file to append the counters and timers of each episode to")
+    parser.add_argument("--cache_dir", default=None, help="folder to cache the prepared problem instances in")
+    return parser
+
+
+if __name__ == "__main__":
+
+    parser = get_parser()
+    args = parser.parse_args()
+    no = args.no
+
+    #path = glob.glob(r"/Users/denism/work/train-schedule-optimisation-challenge-starter-kit/problem_instances/" + no + "*")[0]
+    path = glob.glob(r"inputs/" + no + "*")[0]
 
+    if args.workers > 1:
+        # several processes learning in one qtable, as portfolio.py --shared
+        from portfolio import run_portfolio
+        args.shared = True
+        args.time_budget = TIME_BUDGET
+        run_portfolio(path, args)
+    else:
+        solve(path, args, QTable(), args.seed)
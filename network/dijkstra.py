@@ -1,55 +1,46 @@
-from collections import deque
+import heapq
 import numpy as np
 
 
 def dijkstra(source, train):
-    # 1. Mark all nodes unvisited and store them.
-    # 2. Set the distance to zero for our initial node
-    # and to infinity for other nodes.
-    distances = {vertex.label: -np.inf for vertex in train.network.nodes.values()}
-    # previous_vertices = {vertex.label: None for vertex in train.network.nodes.values()}
-    vertices = train.network.nodes.copy()
-    r = vertices[source].in_links[0].get_requirement()
+    """
+    latest time at which the train can be on each node and still reach source in time.
+    The node with the largest distance is settled first, ties go to the first node of the network, as a heap of
+    (-distance, position) entries. Entries left behind by a larger distance are skipped when popped.
+    """
+    nodes = train.network.nodes
+    position = {label: i for i, label in enumerate(nodes)}
+    distances = {label: -np.inf for label in nodes}
+    visited = set()
+
+    r = nodes[source].in_links[0].get_requirement()
     distances[source] = r.get_exit_latest() - r.get_min_stopping_time()
+    heap = [(-distances[source], position[source], source)]
 
-    while vertices:
-        # 3. Select the unvisited node with the smallest distance,
-        # it's current node now.
-        current_vertex = max(vertices, key=lambda vertex: distances[vertex])
-        # 6. Stop, if the smallest distance
-        # among the unvisited nodes is infinity.
-        if distances[current_vertex] == -np.inf:
-            break
-
-        # 4. Find unvisited neighbors for the current node
-        # and calculate their distances through the current node.
-        for edge in vertices[current_vertex].in_links:
-            neighbour = edge.start_node
+    while heap:
+        distance, _, current_vertex = heapq.heappop(heap)
+        if current_vertex in visited or -distance != distances[current_vertex]:
+            continue
+        visited.add(current_vertex)
+        distance = -distance
+
+        for edge in nodes[current_vertex].in_links:
+            neighbour = edge.start_node.label
             r = edge.get_requirement()
 
-            entry_latest = distances[current_vertex] - edge.get_minimum_running_time()
+            entry_latest = distance - edge.get_minimum_running_time()
             if r is not None:
                 if r.get_min_stopping_time() is not None:
                     entry_latest = entry_latest - r.get_min_stopping_time()
 
                     latest = r.get_entry_latest()
                     if latest < 24 * 60 * 60 * 3:
-                        entry_latest = max(r.get_entry_latest(), entry_latest)
-
-            # Compare the newly calculated distance to the assigned
-            # and save the smaller one.
-            if entry_latest > distances[neighbour.label]:
-                distances[neighbour.label] = entry_latest
-                # previous_vertices[neighbour.label] = current_vertex
-
-        # 5. Mark the current node as visited
-        # and remove it from the unvisited set.
-        del vertices[current_vertex]
-
-    # path, current_vertex = deque(), dest
-    # while previous_vertices[current_vertex] is not None:
-    #    path.appendleft(current_vertex)
-    #    current_vertex = previous_vertices[current_vertex]
-    # if path:
-    #    path.appendleft(current_vertex)
+                        entry_latest = max(latest, entry_latest)
+
+            # a settled node keeps a larger distance but is not expanded again
+            if entry_latest > distances[neighbour]:
+                distances[neighbour] = entry_latest
+                if neighbour not in visited:
+                    heapq.heappush(heap, (-entry_latest, position[neighbour], neighbour))
+
     return distances
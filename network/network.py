@@ -1,5 +1,4 @@
 import logging
-import copy
 from network.node import Node
 from routes.section import Section
 
@@ -8,6 +7,8 @@ class Network(object):
     def __init__(self):
         self.nodes = {}
         self.sections = {}
+        # sections reachable from a node within a number of sections, by (node label, depth)
+        self.reachable = {}
 
     def create(self, timetable):
         for route in timetable.routes.values():
@@ -15,29 +16,48 @@ class Network(object):
         logging.info("%i Nodes created" % len(self.nodes.keys()))
 
     def from_node_id(self, route_path, route_section, index_in_path):
-        if "route_alternative_marker_at_entry" in route_section.keys() and \
-                route_section["route_alternative_marker_at_entry"] is not None and \
-                len(route_section["route_alternative_marker_at_entry"]) > 0:
-            return "(" + str(route_section["route_alternative_marker_at_entry"][0]) + ")"
+        if route_section.get_route_alternative_marker_at_entry() is not None:
+            return "(" + str(route_section.get_route_alternative_marker_at_entry()) + ")"
         else:
             if index_in_path == 0:  # can only get here if this node is a very beginning of a route
                 return "start"
             else:
-                return "(" + (str(route_path["route_sections"][index_in_path - 1]["sequence_number"]) + "->" +
-                              str(route_section["sequence_number"])) + ")"
+                return "(" + (str(route_path.get_sections()[index_in_path - 1].get_number()) + "->" +
+                              str(route_section.get_number())) + ")"
 
     def to_node_id(self, route_path, route_section, index_in_path):
-        if "route_alternative_marker_at_exit" in route_section.keys() and \
-                route_section["route_alternative_marker_at_exit"] is not None and \
-                len(route_section["route_alternative_marker_at_exit"]) > 0:
-
-            return "(" + str(route_section["route_alternative_marker_at_exit"][0]) + ")"
+        if route_section.get_route_alternative_marker_at_exit() is not None:
+            return "(" + str(route_section.get_route_alternative_marker_at_exit()) + ")"
         else:
-            if index_in_path == (len(route_path["route_sections"]) - 1):  # meaning this node is a very end of a route
+            if index_in_path == (len(route_path.get_sections()) - 1):  # meaning this node is a very end of a route
                 return "end"
             else:
-                return "(" + (str(route_section["sequence_number"]) + "->" +
-                              str(route_path["route_sections"][index_in_path + 1]["sequence_number"])) + ")"
+                return "(" + (str(route_section.get_number()) + "->" +
+                              str(route_path.get_sections()[index_in_path + 1].get_number())) + ")"
+
+    def get_reachable_sections(self, node, depth):
+        """
+        sections which can be reached from node going over at most depth sections, sorted by index.
+        Computed once per node and depth
+        """
+        key = (node.label, depth)
+        if key not in self.reachable:
+            sections = set()
+            visited = set([node.label])
+            frontier = [node]
+            n = 0
+            while len(frontier) > 0 and n < depth:
+                next_frontier = []
+                for _node in frontier:
+                    for link in _node.out_links:
+                        sections.add(link)
+                        if link.end_node.label not in visited:
+                            visited.add(link.end_node.label)
+                            next_frontier.append(link.end_node)
+                frontier = next_frontier
+                n += 1
+            self.reachable[key] = tuple(sorted(sections, key=lambda x: x.index))
+        return self.reachable[key]
 
     def get_first_node(self):
         return self.nodes["start"]
@@ -49,8 +69,8 @@ class Network(object):
 
             for (i, section) in enumerate(sections):
 
-                start_id = self.from_node_id(route_path=path._data, route_section=section._data, index_in_path=i)
-                end_id = self.to_node_id(route_path=path._data, route_section=section._data, index_in_path=i)
+                start_id = self.from_node_id(route_path=path, route_section=section, index_in_path=i)
+                end_id = self.to_node_id(route_path=path, route_section=section, index_in_path=i)
 
                 if start_id not in self.nodes:
                     self.nodes[start_id] = Node(label=start_id)
@@ -68,7 +88,7 @@ class Network(object):
 
                 self.sections[section.get_number()] = section
 
-        for node_id in self.nodes:
+        for node_id in list(self.nodes):
             node = self.nodes[node_id]
             if len(node.in_links) == 0:
                 del self.nodes[node_id]
@@ -82,9 +102,13 @@ class Network(object):
         start_node = Node(label="depot")
         end_node = self.nodes["start"]
         _section = list(end_node.out_links)[-1]
-        _data = copy.deepcopy(_section._data)
-        _data["sequence_number"] = -1
-        _data["minimum_running_time"] = "PT1S"
+        # same as the first section of the train, without resources and requirement
+        _data = {"sequence_number": -1,
+                 "minimum_running_time": "PT1S",
+                 "resource_occupations": [],
+                 "starting_point": _section.get_starting_point(),
+                 "ending_point": _section.get_ending_point(),
+                 "penalty": _section.get_penalty()}
         section = Section(data=_data, path=_section.path)
         section.start_node = start_node
         section.requirement = None
@@ -1,6 +1,9 @@
 
 
 class Node(object):
+    # index is set by CompiledTimetable, limit by Simulator.assign_limit
+    __slots__ = ("label", "in_links", "out_links", "index", "limit")
+
     def __init__(self, label):
         self.label = label
         self.in_links = list()
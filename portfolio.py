@@ -0,0 +1,115 @@
+import logging
+import glob
+import os
+import json
+import random
+import time
+import multiprocessing
+
+import numpy as np
+
+from main import create_simulator, run_episodes, get_output_folder, get_parser, TIME_BUDGET
+from simulator.simulator import Simulator
+from simulator.qtable import QTable
+from simulator.shared_qtable import SharedQTable, get_n_states
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+FORMAT = "[%(asctime)s %(filename)s:%(lineno)s - %(funcName)s ] %(message)s"
+logging.basicConfig(format=FORMAT)
+
+# set in every worker by init_worker
+best = None
+stop = None
+shared_qtable = None
+
+
+def init_worker(_best, _stop, _shared_qtable):
+    global best, stop, shared_qtable
+    best = _best
+    stop = _stop
+    shared_qtable = _shared_qtable
+
+
+def write_best(sim, score):
+    output_folder = get_output_folder(sim)
+    tmp_path = os.path.join(output_folder, "best.json.tmp")
+    with open(tmp_path, 'w') as outfile:
+        json.dump([sim.create_output()], outfile)
+    os.replace(tmp_path, os.path.join(output_folder, "best.json"))
+    logging.info("new best score %f" % score)
+
+
+def work(path, args, seed, deadline):
+    """
+    runs the episodes of one seed, writes the solution when it beats the best score of all the workers
+    """
+    qtable = shared_qtable if shared_qtable is not None else QTable()
+    sim = create_simulator(path, args, qtable)
+    random.seed(seed)
+
+    def report(score):
+        with best.get_lock():
+            if score < best.value:
+                best.value = score
+                write_best(sim, score)
+        if score == 0.0:
+            stop.set()
+
+    def should_stop():
+        return stop.is_set() or time.time() > deadline
+
+    return seed, run_episodes(sim, report=report, should_stop=should_stop)
+
+
+def run_portfolio(path, args):
+    """
+    runs args.workers seeds in a process pool until one finds a score of 0 or the time budget is over.
+    Returns the best score
+    """
+    deadline = time.time() + args.time_budget
+    _best = multiprocessing.Value("d", np.inf)
+    _stop = multiprocessing.Event()
+
+    _shared_qtable = None
+    if args.shared:
+        sim = Simulator(path=path, qtable=None, cache_dir=args.cache_dir)
+        max_width = int(np.diff(sim.compiled.node_out_ptr).max())
+        n_states = args.shared_states or get_n_states(len(sim.compiled.sections))
+        _shared_qtable = SharedQTable(n_states=n_states, max_width=max_width)
+        sim.qtable = _shared_qtable
+        if args.qtable_dir is not None:
+            sim.load_qtable(args.qtable_dir)
+
+    seeds = [args.seed + k for k in range(args.workers)]
+    pool = multiprocessing.Pool(processes=args.workers, initializer=init_worker,
+                                initargs=(_best, _stop, _shared_qtable))
+    try:
+        results = pool.starmap_async(work, [(path, args, seed, deadline) for seed in seeds])
+        results.wait(timeout=max(0, deadline - time.time()))
+        _stop.set()
+        for seed, score in results.get():
+            logging.info("seed %i: %f" % (seed, score))
+        pool.close()
+        if _shared_qtable is not None and args.qtable_dir is not None:
+            sim.save_qtable(args.qtable_dir)
+    finally:
+        pool.terminate()
+        pool.join()
+        if _shared_qtable is not None:
+            _shared_qtable.close()
+            _shared_qtable.unlink()
+
+    logging.info("best score %f" % _best.value)
+    return _best.value
+
+
+if __name__ == "__main__":
+    parser = get_parser()
+    parser.add_argument("--time_budget", default=TIME_BUDGET, type=float, help="seconds")
+    parser.add_argument("--shared", action="store_true", help="workers learn in one shared qtable")
+    args = parser.parse_args()
+
+    path = glob.glob(r"inputs/" + args.no + "*")[0]
+    run_portfolio(path, args)
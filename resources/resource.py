@@ -2,17 +2,23 @@ import isodate
 
 
 class Resource(object):
+    # index is set by CompiledTimetable
+    __slots__ = ("id", "following_allowed", "sections", "free", "last_used_by", "last_exit_time", "currently_used_by",
+                 "waiting_events", "release_time", "index")
+
     def __init__(self, data):
-        self._data = data
-        self.id = self._data["id"]
+        self.id = data["id"]
+        self.following_allowed = data["following_allowed"]
         self.sections = []
 
         self.free = True
         self.last_used_by = None
         self.last_exit_time = None
         self.currently_used_by = None
+        # events of trains waiting for this resource to be released
+        self.waiting_events = []
 
-        self.release_time = isodate.parse_duration(self._data["release_time"]).seconds
+        self.release_time = isodate.parse_duration(data["release_time"]).seconds
 
     def get_id(self):
         return self.id
@@ -30,7 +36,7 @@ class Resource(object):
         """flag whether the resource is of following type (true) or of blocking type (false).
         As mentioned, all resources in all the provided problem instances have this field set to false
         """
-        return self._data["following_allowed"]
+        return self.following_allowed
 
     def __str__(self):
         return "%s (%i s)" % (self.get_id(), self.get_release_time())
@@ -39,36 +45,85 @@ class Resource(object):
         if self.free:
             return True
 
-        if train == self.last_used_by:
+        # trains are unique objects, identity is the same as Train.__eq__ and much cheaper
+        if train is self.last_used_by:
             return True
 
         return False
 
-    def enter(self, train, at):
+    def reset(self):
+        self.free = True
+        self.currently_used_by = None
+        self.last_exit_time = None
+        self.last_used_by = None
+        self.waiting_events = []
+
+    # the changes below are recorded in journal when one is given, each with the previous value of the fields it
+    # sets, so that go_back can undo them
+
+    def enter(self, train, at, journal=None):
         assert self.currently_used_by is None or self.currently_used_by == train
 
+        if journal is not None and (self.free or self.currently_used_by is not train):
+            journal.record(self.undo_enter, self.free, self.currently_used_by, self.last_used_by)
         self.free = False
         self.currently_used_by = train
         self.last_used_by = train
 
-    def exit(self, train, at):
+    def undo_enter(self, free, currently_used_by, last_used_by):
+        self.free = free
+        self.currently_used_by = currently_used_by
+        self.last_used_by = last_used_by
+
+    def exit(self, train, at, journal=None):
         assert self.free is False
         assert self.last_used_by == train
 
+        if journal is not None:
+            journal.record(self.undo_exit, self.currently_used_by, self.last_exit_time)
         self.currently_used_by = None
         self.last_exit_time = at
 
-    def release(self, train, release_time):
+    def undo_exit(self, currently_used_by, last_exit_time):
+        self.currently_used_by = currently_used_by
+        self.last_exit_time = last_exit_time
+
+    def release(self, train, release_time, journal=None):
+        """
+        frees the resource and returns the events of the trains waiting for it
+        """
         if release_time < self.last_exit_time:
-            return
+            return []
         if self.currently_used_by is not None:
-            return
+            return []
 
         assert self.free is False
         assert self.currently_used_by is None, "%s %s" % (train, self)
         assert train == self.last_used_by
 
+        events = self.waiting_events
+        if journal is not None:
+            journal.record(self.undo_release, events)
         self.free = True
+        self.waiting_events = []
+        return events
+
+    def undo_release(self, waiting_events):
+        self.free = False
+        self.waiting_events = waiting_events
+
+    def subscribe(self, event, journal=None):
+        if event not in self.waiting_events:
+            self.waiting_events.append(event)
+            if journal is not None:
+                journal.record(self.waiting_events.pop)
+
+    def unsubscribe(self, event, journal=None):
+        if event in self.waiting_events:
+            i = self.waiting_events.index(event)
+            del self.waiting_events[i]
+            if journal is not None:
+                journal.record(self.waiting_events.insert, i, event)
 
     def __hash__(self):
         return hash(self.get_id())
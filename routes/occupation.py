@@ -1,9 +1,10 @@
 class Occupation(object):
+    __slots__ = ("resource", "id")
+
     def __init__(self, data, section):
-        self._data = data
         #will be in simulator assigned
         self.resource = None
-        self.id = self._data["resource"]
+        self.id = data["resource"]
 
     def get_resource_id(self):
         return self.id
@@ -3,12 +3,12 @@ from routes.section import Section
 
 class Path(object):
     def __init__(self, data, route):
-        self._data = data
+        self.id = data["id"]
         self._route = route
-        self.sections = [Section(d, self) for d in self._data["route_sections"]]
+        self.sections = [Section(d, self) for d in data["route_sections"]]
 
     def get_id(self):
-        return self._data["id"]
+        return self.id
 
     def get_sections(self):
         return self.sections
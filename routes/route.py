@@ -3,12 +3,12 @@ from routes.path import Path
 
 class Route(object):
     def __init__(self, data, train):
-        self._data = data
+        self.id = data["id"]
         self.train = train
-        self.paths = {d["id"]: Path(d, self) for d in self._data["route_paths"]}
+        self.paths = {d["id"]: Path(d, self) for d in data["route_paths"]}
 
     def get_id(self):
-        return self._data["id"]
+        return self.id
 
     def get_paths(self):
         return self.paths
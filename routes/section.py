@@ -1,33 +1,36 @@
 import isodate
+from functools import lru_cache
 from routes.occupation import Occupation
 
 MAX_TIME = 24 * 60 * 60
 
 
 class Section(object):
+    # index and slot are set by CompiledTimetable
+    __slots__ = ("path", "train", "number", "starting_point", "ending_point", "penalty",
+                 "route_alternative_marker_at_entry", "route_alternative_marker_at_exit", "start_node", "end_node",
+                 "occupations", "marker", "requirement", "id", "minimum_running_time", "index", "slot")
+
     def __init__(self, data, path):
-        self._data = data
         self.path = path
         self.train = path._route.train
+        self.number = data["sequence_number"]
+        self.starting_point = data.get("starting_point")
+        self.ending_point = data.get("ending_point")
+        self.penalty = data.get("penalty") or 0.0
+        self.route_alternative_marker_at_entry = first(data.get("route_alternative_marker_at_entry"))
+        self.route_alternative_marker_at_exit = first(data.get("route_alternative_marker_at_exit"))
 
         self.start_node = None
         self.end_node = None
 
-        self.occupations = [Occupation(data=d, section=self) for d in self._data["resource_occupations"]]
-        self.marker = None
-
-        if "section_marker" in self._data:
-            markers = self._data["section_marker"]
-            if len(markers) > 0:
-                self.marker = markers[0]
+        self.occupations = [Occupation(data=d, section=self) for d in data["resource_occupations"]]
+        self.marker = first(data.get("section_marker"))
 
-        self.requirement = None
-        requirements = [r for r in self.train.get_requirements() if r.get_section_marker() == self.get_marker()]
-        if len(requirements) > 0:
-            self.requirement = requirements[0]
+        self.requirement = self.train.get_requirement(self.get_marker())
 
         self.id = "%s#%s" % (self.path._route.get_id(), self.get_number())
-        self.minimum_running_time = isodate.parse_duration(self._data["minimum_running_time"]).seconds
+        self.minimum_running_time = parse_seconds(data["minimum_running_time"])
 
     def __repr__(self):
         return "%s" % (self.get_id())
@@ -39,36 +42,25 @@ class Section(object):
         """an ordering number.
         The train passes over the route_sections in this order. This is necessary because the JSON specification does not guarantee that the sequence in the file is preserved when deserializing.
         """
-        return self._data["sequence_number"]
+        return self.number
 
     def get_starting_point(self):
-        return self._data["starting_point"]
+        return self.starting_point
 
     def get_ending_point(self):
-        return self._data["ending_point"]
+        return self.ending_point
 
     def get_penalty(self):
         """used in the objective function for the timetable.
         If a train uses this route_section, this penalty accrues.  This field is optional. If it is not present, this is equivalent to penalty = 0.
         """
-        key = "penalty"
-        if key in self._data:
-            value = self._data[key]
-            if value is None:
-                return 0.0
-            else:
-                return value
-        return 0.0
+        return self.penalty
 
     def get_route_alternative_marker_at_exit(self):
-        key = "route_alternative_marker_at_exit"
-        if key in self._data:
-            return self._data[key][0]
+        return self.route_alternative_marker_at_exit
 
     def get_route_alternative_marker_at_entry(self):
-        key = "route_alternative_marker_at_entry"
-        if key in self._data:
-            return self._data[key][0]
+        return self.route_alternative_marker_at_entry
 
     def get_minimum_running_time(self):
         """minimum time (duration) the train must spend on this route_section
@@ -99,8 +91,8 @@ class Section(object):
         return self.requirement
 
     def is_free(self):
-        for r in self.get_resources():
-            if not r.is_free_for(train=self.train):
+        for o in self.occupations:
+            if not o.resource.is_free_for(train=self.train):
                 return False
         return True
 
@@ -108,7 +100,23 @@ class Section(object):
         blocking_trains = []
         for o in self.occupations:
             r = o.resource
-
-            if r.currently_used_by is not None and r.currently_used_by != self.train:
+            if r.currently_used_by is not None and r.currently_used_by is not self.train:
                 blocking_trains.append(r.currently_used_by)
         return blocking_trains
+
+
+def first(values):
+    """
+    first item of an optional list, markers are given as lists of at most one item
+    """
+    if values:
+        return values[0]
+    return None
+
+
+@lru_cache(maxsize=None)
+def parse_seconds(duration):
+    """
+    seconds of an ISO 8601 duration, the same few running times are repeated over all the sections
+    """
+    return isodate.parse_duration(duration).seconds
@@ -2,10 +2,14 @@ import numpy as np
 
 
 class Event(object):
+    __slots__ = ("time", "train", "priority", "queue_id")
+
     def __init__(self, time, train):
         self.time = time
         self.train = train
         self.priority = 0
+        # set by the EventQueue while the event is planned
+        self.queue_id = None
 
     def __str__(self):
         return humanize_time(self.time) + "  -->EVENT %s" % self.train
@@ -18,18 +22,24 @@ class Event(object):
 
 
 class EnterNodeEvent(Event):
-    def __init__(self, node, previous_section, **kwargs):
-        Event.__init__(self, **kwargs)
+    __slots__ = ("node", "previous_section", "waiting_on")
+
+    def __init__(self, time, train, node, previous_section):
+        Event.__init__(self, time, train)
         self.node = node
         self.previous_section = previous_section
+        # resources the train is waiting on to be released
+        self.waiting_on = []
 
     def __str__(self):
         return super(EnterNodeEvent, self).__str__() + " enters %s coming from %s" % (self.node, self.previous_section)
 
 
 class DestinationNodeEvent(Event):
-    def __init__(self, node, previous_section, **kwargs):
-        Event.__init__(self, **kwargs)
+    __slots__ = ("node", "previous_section")
+
+    def __init__(self, time, train, node, previous_section):
+        Event.__init__(self, time, train)
         self.node = node
         self.previous_section = previous_section
 
@@ -38,8 +48,10 @@ class DestinationNodeEvent(Event):
 
 
 class LeaveNodeEvent(Event):
-    def __init__(self, node, previous_section, next_section, **kwargs):
-        Event.__init__(self, **kwargs)
+    __slots__ = ("node", "next_section", "previous_section")
+
+    def __init__(self, time, train, node, previous_section, next_section):
+        Event.__init__(self, time, train)
         self.node = node
         self.next_section = next_section
         self.previous_section = previous_section
@@ -50,8 +62,10 @@ class LeaveNodeEvent(Event):
 
 
 class EnterStationEvent(Event):
-    def __init__(self, section, **kwargs):
-        Event.__init__(self, **kwargs)
+    __slots__ = ("section",)
+
+    def __init__(self, time, train, section):
+        Event.__init__(self, time, train)
         self.section = section
 
     def __str__(self):
@@ -59,8 +73,10 @@ class EnterStationEvent(Event):
 
 
 class LeaveStationEvent(Event):
-    def __init__(self, section, **kwargs):
-        Event.__init__(self, **kwargs)
+    __slots__ = ("section",)
+
+    def __init__(self, time, train, section):
+        Event.__init__(self, time, train)
         self.section = section
 
     def __str__(self):
@@ -68,18 +84,22 @@ class LeaveStationEvent(Event):
 
 
 class WaitingOnSection(Event):
-    def __init__(self, node, section, **kwargs):
+    __slots__ = ("node", "previous_section")
+
+    def __init__(self, time, train, node, section):
         self.node = node
         self.previous_section = section
-        Event.__init__(self, **kwargs)
+        Event.__init__(self, time, train)
 
     def __str__(self):
         return super(WaitingOnSection, self).__str__() + " has been waiting"
 
 
 class ReleaseResourceEvent(Event):
-    def __init__(self, resource, emited_at, **kwargs):
-        Event.__init__(self, **kwargs)
+    __slots__ = ("resource", "emited_at")
+
+    def __init__(self, time, train, resource, emited_at):
+        Event.__init__(self, time, train)
         self.resource = resource
         self.emited_at = emited_at
 
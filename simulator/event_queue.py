@@ -0,0 +1,76 @@
+import heapq
+import itertools
+
+
+class EventQueue(object):
+    """
+    priority queue of events ordered by time.
+    Events with the same time are returned in the order they were pushed, like the old per-second buckets.
+    Pushing an event which is already in the queue moves it: the old entry is skipped when popped.
+    If a journal is given, every change is recorded so that it can be undone.
+    """
+
+    def __init__(self, journal=None):
+        self.heap = []
+        self.counter = itertools.count()
+        self.n_stale = 0
+        self.journal = journal
+
+    def __len__(self):
+        return len(self.heap) - self.n_stale
+
+    def push(self, event):
+        previous_id = event.queue_id
+        if previous_id is not None:
+            self.n_stale += 1
+        event.queue_id = next(self.counter)
+        entry = (event.time, event.queue_id, event)
+        heapq.heappush(self.heap, entry)
+        if self.journal is not None:
+            self.journal.record(self.undo_push, entry, previous_id)
+
+    def pop(self):
+        self.drop_stale()
+        entry = heapq.heappop(self.heap)
+        time, _, event = entry
+        event.queue_id = None
+        event.time = time
+        if self.journal is not None:
+            self.journal.record(self.undo_pop, entry)
+        return event
+
+    def next_time(self):
+        self.drop_stale()
+        return self.heap[0][0]
+
+    def drop_stale(self):
+        while self.heap[0][1] != self.heap[0][2].queue_id:
+            entry = heapq.heappop(self.heap)
+            self.n_stale -= 1
+            if self.journal is not None:
+                self.journal.record(self.undo_drop, entry)
+
+    def undo_push(self, entry, previous_id):
+        # the pushed entry stays in the heap as a stale one
+        event = entry[2]
+        event.queue_id = previous_id
+        if previous_id is not None:
+            self.n_stale -= 1
+        self.n_stale += 1
+
+    def undo_pop(self, entry):
+        time, queue_id, event = entry
+        event.queue_id = queue_id
+        event.time = time
+        heapq.heappush(self.heap, entry)
+
+    def undo_drop(self, entry):
+        heapq.heappush(self.heap, entry)
+        self.n_stale += 1
+
+    def clear(self):
+        for _, _, event in self.heap:
+            event.queue_id = None
+        self.heap = []
+        self.n_stale = 0
+
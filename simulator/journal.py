@@ -0,0 +1,50 @@
+class Journal(object):
+    """
+    trail of the changes made during a run.
+    Each entry holds the time of the change and how to undo it, so that going back to a time only undoes
+    the changes made after it.
+    """
+
+    def __init__(self):
+        self.entries = []
+        # time of the changes being recorded
+        self.time = 0
+        # earliest time the journal can go back to, the older entries have been trimmed
+        self.horizon = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def record(self, undo, *args):
+        self.entries.append((self.time, undo, args))
+
+    def undo_after(self, time):
+        assert time >= self.horizon
+        entries = self.entries
+        while len(entries) > 0 and entries[-1][0] > time:
+            _, undo, args = entries.pop()
+            undo(*args)
+        self.time = time
+
+    def trim(self, time):
+        """
+        drops the entries recorded at or before time, nothing will go back before it
+        """
+        if time <= self.horizon:
+            return
+        entries = self.entries
+        # entries are in time order, the first one after time is found by bisection
+        lo, hi = 0, len(entries)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if entries[mid][0] <= time:
+                lo = mid + 1
+            else:
+                hi = mid
+        del entries[:lo]
+        self.horizon = time
+
+    def clear(self, time=0):
+        self.entries = []
+        self.time = time
+        self.horizon = time
@@ -1,12 +1,36 @@
 from collections import defaultdict
+import os
+import json
+import pickle
 import random
 import numpy as np
 import logging
 
+# to bump whenever the saved files change meaning: the state keys hold compiled indices of the timetable
+QTABLE_VERSION = 1
+
+# slots of an empty table, the arrays double when full
+MIN_SIZE = 1024
+
 
 class QTable(object):
+    """
+    q values stored in one numpy array.
+    Each interned state gets a block with one slot per out link of its node, an action is the slot of the section
+    in its start node. Values are drawn at random when the block is created and only the values already used
+    count for the next max, as with the former dict of dicts.
+    """
+
+    # saved tables of each layout go to their own folder
+    layout = "dense"
+
     def __init__(self):
-        self.q_values = defaultdict(lambda: defaultdict(lambda: random.random()))
+        self.values = np.zeros(MIN_SIZE, dtype=np.float64)
+        self.used = np.zeros(MIN_SIZE, dtype=bool)
+        self.size = 0
+        # offset and width of the block of each state, -1 until the state has been used
+        self.offsets = []
+        self.widths = []
 
         self.epsilon = 0.9
         self.alpha = 0.1
@@ -14,10 +38,54 @@ class QTable(object):
 
         self.to_avoid = defaultdict(list)
 
+        # small int for each state key seen so far
+        self.state_ids = {}
+
+    def intern_state(self, key):
+        state = self.state_ids.get(key)
+        if state is None:
+            state = len(self.state_ids)
+            self.state_ids[key] = state
+            self.offsets.append(-1)
+            self.widths.append(0)
+        return state
+
+    def get_block(self, state, section):
+        """
+        offset of the block of state, created with one slot per out link of the start node of section
+        """
+        if state is None:
+            state = self.intern_state(None)
+        offset = self.offsets[state]
+        if offset < 0:
+            width = len(section.start_node.out_links)
+            if self.size + width > len(self.values):
+                self.grow(self.size + width)
+            offset = self.size
+            self.values[offset:offset + width] = [random.random() for _ in range(width)]
+            self.size += width
+            self.offsets[state] = offset
+            self.widths[state] = width
+        return offset
+
+    def grow(self, size):
+        """
+        makes room for size slots. A loaded table may be empty, its arrays can not just be doubled
+        """
+        new_size = max(size, 2 * len(self.values), MIN_SIZE)
+        values = np.zeros(new_size, dtype=np.float64)
+        used = np.zeros(new_size, dtype=bool)
+        values[:self.size] = self.values[:self.size]
+        used[:self.size] = self.used[:self.size]
+        self.values = values
+        self.used = used
+
     def remove(self, state, action):
-        if state in self.q_values:
-            if action in self.q_values[state]:
-                del self.q_values[state]
+        offset = self.offsets[state]
+        if offset >= 0 and self.used[offset + action.slot]:
+            width = self.widths[state]
+            self.values[offset:offset + width] = [random.random() for _ in range(width)]
+            self.used[offset:offset + width] = False
 
     def get_action(self, choices, state):
         if len(choices) == 1:
@@ -26,28 +94,82 @@ class QTable(object):
         if random.uniform(0, 1) < self.epsilon:
             action = random.choice(choices)  # Explore action space
         else:
-            max_value = -999999
-            action = None
-            for c in choices:
-                value = self.q_values[state][c.get_id()]
-                if value > max_value:
-                    action = c
-                    max_value = value
+            offset = self.get_block(state, choices[0])
+            slots = offset + np.array([c.slot for c in choices])
+            self.used[slots] = True
+            values = self.values[slots]
+            i = np.argmax(values)
+            action = choices[i] if values[i] > -999999 else None
         if action is None:
             # I don't why but needed for problem 9
             action = random.choice(choices)
         return action
 
+    def get_max(self, state):
+        if state is None or self.offsets[state] < 0:
+            return 0
+        offset = self.offsets[state]
+        width = self.widths[state]
+        used = self.used[offset:offset + width]
+        if not used.any():
+            return 0
+        return self.values[offset:offset + width][used].max()
+
     def update_table(self, previous_state, current_state, previous_action, reward):
         assert reward != np.inf and (reward != -np.inf)
-        previous_value = self.q_values[previous_state][previous_action.get_id()]
-        next_max = 0
-        if len(self.q_values[current_state].values()) > 0:
-            next_max = max(self.q_values[current_state].values())
+        section = previous_action.section
+        slot = self.get_block(previous_state, section) + section.slot
+        previous_value = self.values[slot]
+        self.used[slot] = True
+        next_max = self.get_max(current_state)
         new_value = (1 - self.alpha) * previous_value + self.alpha * (reward + self.gamma * next_max)
         assert new_value != np.inf
         assert new_value != -np.inf
-        self.q_values[previous_state][previous_action.get_id()] = new_value
+        self.values[slot] = new_value
+
+    def save(self, path, instance_hash):
+        """
+        writes the q values, the states and the avoid rules in the folder path
+        """
+        if not os.path.exists(path):
+            os.makedirs(path)
+        save_array(path, "values", self.values[:self.size])
+        save_array(path, "used", self.used[:self.size])
+        save_array(path, "offsets", np.array(self.offsets, dtype=np.int64))
+        save_array(path, "widths", np.array(self.widths, dtype=np.int64))
+        self.save_avoid(path)
+
+        keys = sorted(self.state_ids, key=lambda key: self.state_ids[key])
+        with open(os.path.join(path, "states.pkl"), "wb") as f:
+            pickle.dump(keys, f, protocol=pickle.HIGHEST_PROTOCOL)
+        save_meta(path, self.layout, instance_hash)
+
+    def load(self, path, sections, instance_hash):
+        """
+        reads a table written by save. The q values are memory mapped (copy on write).
+        sections are the sections of the compiled timetable, to resolve the avoid rules.
+        Raises ValueError if the table was saved by another version or for another instance
+        """
+        check_meta(path, self.layout, instance_hash)
+        self.values = np.load(os.path.join(path, "values.npy"), mmap_mode="c")
+        self.used = np.load(os.path.join(path, "used.npy"), mmap_mode="c")
+        self.size = len(self.values)
+        self.offsets = np.load(os.path.join(path, "offsets.npy")).tolist()
+        self.widths = np.load(os.path.join(path, "widths.npy")).tolist()
+
+        with open(os.path.join(path, "states.pkl"), "rb") as f:
+            keys = pickle.load(f)
+        self.state_ids = {key: i for i, key in enumerate(keys)}
+        self.load_avoid(path, sections)
+
+    def save_avoid(self, path):
+        avoid = [(on.index, if_on.index) for on, ifs_on in self.to_avoid.items() for if_on in ifs_on]
+        save_array(path, "to_avoid", np.array(avoid, dtype=np.int64).reshape(-1, 2))
+
+    def load_avoid(self, path, sections):
+        self.to_avoid = defaultdict(list)
+        for on, if_on in np.load(os.path.join(path, "to_avoid.npy")):
+            self.to_avoid[sections[on]].append(sections[if_on])
 
     def do_not_go(self, on, if_on):
         # if on not in self.to_avoid:
@@ -70,20 +192,49 @@ class QTable(object):
         return True
 
 
+def save_array(path, name, array):
+    # written aside and then moved, a table loaded with mmap may still be reading the old file
+    tmp_path = os.path.join(path, name + ".tmp.npy")
+    np.save(tmp_path, array)
+    os.replace(tmp_path, os.path.join(path, name + ".npy"))
+
+
+def save_meta(path, layout, instance_hash):
+    meta = {"version": QTABLE_VERSION, "layout": layout, "hash": instance_hash}
+    tmp_path = os.path.join(path, "meta.tmp.json")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(path, "meta.json"))
+
+
+def check_meta(path, layout, instance_hash):
+    """
+    raises ValueError unless the table in path was saved with this version and layout for this instance
+    """
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_path):
+        raise ValueError("%s has no meta.json, saved by an older version" % path)
+    with open(meta_path) as f:
+        meta = json.load(f)
+    expected = {"version": QTABLE_VERSION, "layout": layout, "hash": instance_hash}
+    if meta != expected:
+        raise ValueError("%s was saved as %s, expected %s" % (path, meta, expected))
+
+
 def get_state_id(train, limit):
+    """
+    hashable key of the state of a train: its train and section ids, and for each section reachable within limit
+    the ids of the other trains blocking it
+    """
     n = len(train.solution.sections)
     if n == 0:
-        return "start_%s" % train
+        return (train.index,)
     else:
         s = train.solution.sections[-1]
-    flat_list = list(set([item for sublist in train.compute_routes(s.get_end_node(), limit=limit) for item in sublist]))
-    flat_list = sorted(flat_list, key=lambda x: x.get_id())
-
-    _id = "%s_%s->" % (train, s.get_id())
-
-    for item in flat_list:
-        ids = list(set(map(str, item.block_by())))
+    key = [train.index, s.section.index]
+    for item in train.network.get_reachable_sections(s.get_end_node(), limit):
+        ids = sorted(set([t.index for t in item.block_by()]))
         if len(ids) > 0:
-            _id += "%s[" % item.get_id() + "-".join(ids) + "]"
+            key.append((item.index, tuple(ids)))
 
-    return _id
+    return tuple(key)
@@ -0,0 +1,202 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import random
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from simulator.qtable import QTable, save_array, save_meta, check_meta
+
+# state of the keys which found no free slot: nothing is learnt for them, their actions are drawn at random
+FULL = -1
+
+# slots probed for a key before giving up, the table is then too full for probing to stay cheap
+MAX_PROBES = 64
+
+# size of the tables sized from the instance: a run interns about one state per section with n_state=1, the margin
+# covers larger lookaheads and keeps the probes short
+STATES_PER_SECTION = 16
+MIN_STATES = 2 ** 16
+
+
+def get_n_states(n_sections):
+    return max(MIN_STATES, STATES_PER_SECTION * n_sections)
+
+
+class SharedQTable(QTable):
+    """
+    qtable whose q values live in shared memory, so that worker processes learn together.
+    States are found by a 64 bit fingerprint of their key in an open addressing table, so that every process gives
+    a state the same slot. Each slot has room for max_width actions.
+    Creating states takes one of a few striped locks, updating q values takes no lock: a concurrent update may be lost.
+    When the table is full, new states are not learnt.
+    The avoid rules stay local to each process, they are not saved with the table.
+    """
+
+    layout = "shared"
+
+    def __init__(self, n_states, max_width, n_locks=64, name=None):
+        QTable.__init__(self)
+        self.n_states = n_states
+        self.max_width = max_width
+        self.n_locks = n_locks
+
+        create = name is None
+        size = n_states * (8 * max_width + 8 + 4 + max_width)
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        self.attach()
+        self.warned_full = False
+        if create:
+            self.keys[:] = 0
+            self.widths[:] = 0
+            self.locks = [multiprocessing.Lock() for _ in range(n_locks)]
+            # the state without key always has a slot
+            self.intern_state(None)
+
+    def attach(self):
+        n, w = self.n_states, self.max_width
+        buf = self.shm.buf
+        offset = 0
+        self.values = np.ndarray((n * w,), dtype=np.float64, buffer=buf, offset=offset)
+        offset += 8 * n * w
+        self.keys = np.ndarray((n,), dtype=np.int64, buffer=buf, offset=offset)
+        offset += 8 * n
+        self.widths = np.ndarray((n,), dtype=np.int32, buffer=buf, offset=offset)
+        offset += 4 * n
+        self.used = np.ndarray((n * w,), dtype=bool, buffer=buf, offset=offset)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for key in ["shm", "values", "keys", "used", "widths"]:
+            del state[key]
+        state["shm_name"] = self.shm.name
+        return state
+
+    def __setstate__(self, state):
+        name = state.pop("shm_name")
+        self.__dict__.update(state)
+        self.shm = shared_memory.SharedMemory(name=name)
+        self.attach()
+
+    def close(self):
+        self.values = self.keys = self.used = self.widths = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+    @staticmethod
+    def fingerprint(key):
+        if key is None:
+            key = (-1,)
+        # hash() of a key holding strings changes with PYTHONHASHSEED, the repr of the key does not
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=8).digest()
+        fp = int.from_bytes(digest, "little") & 0x7FFFFFFFFFFFFFFF
+        return fp if fp != 0 else 1
+
+    def intern_state(self, key):
+        return self.intern_fingerprint(self.fingerprint(key))
+
+    def intern_fingerprint(self, fp):
+        slot = fp % self.n_states
+        for _ in range(min(MAX_PROBES, self.n_states)):
+            k = self.keys[slot]
+            if k == fp:
+                return slot
+            if k == 0:
+                with self.locks[slot % self.n_locks]:
+                    k = self.keys[slot]
+                    if k == 0:
+                        self.keys[slot] = fp
+                        return slot
+                    if k == fp:
+                        return slot
+            slot = (slot + 1) % self.n_states
+        if not self.warned_full:
+            logging.warning("shared qtable is full (%i states), new states are not learnt" % self.n_states)
+            self.warned_full = True
+        return FULL
+
+    def get_action(self, choices, state):
+        if state == FULL:
+            return random.choice(choices)
+        return QTable.get_action(self, choices, state)
+
+    def update_table(self, previous_state, current_state, previous_action, reward):
+        if previous_state == FULL:
+            return
+        if current_state == FULL:
+            current_state = None
+        QTable.update_table(self, previous_state, current_state, previous_action, reward)
+
+    def get_block(self, state, section):
+        if state is None:
+            state = self.intern_state(None)
+        offset = state * self.max_width
+        if self.widths[state] == 0:
+            width = len(section.start_node.out_links)
+            assert width <= self.max_width
+            with self.locks[state % self.n_locks]:
+                if self.widths[state] == 0:
+                    self.values[offset:offset + width] = [random.random() for _ in range(width)]
+                    self.used[offset:offset + width] = False
+                    self.widths[state] = width
+        return offset
+
+    def get_max(self, state):
+        if state is None or self.widths[state] == 0:
+            return 0
+        offset = state * self.max_width
+        width = int(self.widths[state])
+        used = self.used[offset:offset + width]
+        if not used.any():
+            return 0
+        return self.values[offset:offset + width][used].max()
+
+    def remove(self, state, action):
+        if state == FULL:
+            return
+        width = int(self.widths[state])
+        offset = state * self.max_width
+        if width > 0 and self.used[offset + action.slot]:
+            self.values[offset:offset + width] = [random.random() for _ in range(width)]
+            self.used[offset:offset + width] = False
+
+    def save(self, path, instance_hash):
+        """
+        writes the fingerprints and q values of the states created so far in the folder path
+        """
+        if not os.path.exists(path):
+            os.makedirs(path)
+        states = np.flatnonzero(self.widths)
+        blocks = (states[:, None] * self.max_width + np.arange(self.max_width)).ravel()
+        save_array(path, "keys", self.keys[states])
+        save_array(path, "widths", self.widths[states])
+        save_array(path, "values", self.values[blocks].reshape(-1, self.max_width))
+        save_array(path, "used", self.used[blocks].reshape(-1, self.max_width))
+        save_meta(path, self.layout, instance_hash)
+
+    def load(self, path, sections, instance_hash):
+        """
+        adds the states of a table written by save, at their slot in this table.
+        Raises ValueError if the table was saved by another version or for another instance
+        """
+        check_meta(path, self.layout, instance_hash)
+        keys = np.load(os.path.join(path, "keys.npy"))
+        widths = np.load(os.path.join(path, "widths.npy"))
+        values = np.load(os.path.join(path, "values.npy"))
+        used = np.load(os.path.join(path, "used.npy"))
+        if len(widths) > 0 and widths.max() > self.max_width:
+            raise ValueError("%s has states wider than %i actions" % (path, self.max_width))
+
+        for fp, width, state_values, state_used in zip(keys, widths, values, used):
+            state = self.intern_fingerprint(int(fp))
+            if state == FULL:
+                break
+            offset = state * self.max_width
+            with self.locks[state % self.n_locks]:
+                self.values[offset:offset + width] = state_values[:width]
+                self.used[offset:offset + width] = state_used[:width]
+                self.widths[state] = width
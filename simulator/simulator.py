@@ -1,19 +1,23 @@
 import logging
+import os
 import numpy as np
 import random
 import itertools
+from collections import defaultdict
 
 from timetable import Timetable
+import instance_cache
 from simulator.event import EnterNodeEvent
 from simulator.event import EnterStationEvent
 from simulator.event import ReleaseResourceEvent
 from trains.requirement import HaltRequirement
 from simulator.event import humanize_time
-from collections import defaultdict
+from simulator.event_queue import EventQueue
+from simulator.journal import Journal
 from simulator.qtable import get_state_id
 from network.dijkstra import dijkstra
 from trains.connection import WaitingConnection
-from trains.solution import Solution, SectionSolution
+from trains.solution import Solution, SectionSolution, MAX_TIME
 
 
 class BlockinException(Exception):
@@ -22,19 +26,48 @@ class BlockinException(Exception):
         self.back_time = back_time
 
 
+class StopException(Exception):
+    """
+    raised by run when should_stop returns True
+    """
+
+
+# events handled between two calls to should_stop, and between two trims of the journal
+CHECK_INTERVAL = 1000
+
+
 class Simulator(object):
-    def __init__(self, path, qtable):
-        self.timetable = Timetable(json_path=path)
+    def __init__(self, path, qtable, cache_dir=None):
+        # prepared instances are cached by hash in cache_dir, see prepare
+        self.path = path
+        self.cache_dir = cache_dir
+        cached = instance_cache.load(cache_dir, path) if cache_dir is not None else None
+        if cached is not None:
+            self.timetable, self.compiled = cached
+            self.prepared = True
+        else:
+            self.timetable = Timetable(json_path=path)
+            self.compiled = self.timetable.compile()
+            self.prepared = False
         self.resources = self.timetable.resources
         self.trains = list(self.timetable.trains.values())
 
-        self.events = defaultdict(list)
+        # changes made during a run, undone by go_back
+        self.journal = Journal()
+        self.use_journal = True
+        # seconds of changes kept in the journal, going back further rebuilds the state, which is then faster
+        self.journal_depth = 2 * 60 * 60
+        self.events = EventQueue(journal=self.journal)
         self.qtable = qtable
 
         self.current_time = 0
         self.min_time = 9999999
         self.max_time = 0
         self.wait_time = 10.0
+        # blocked trains are woken up when a resource is released, instead of polling every wait_time
+        self.wake_on_release = True
+        # trains waiting for a connection are woken up when the connecting train arrives
+        self.wake_on_connection = True
         self.done = False
         self.late_on_node = False
 
@@ -42,8 +75,23 @@ class Simulator(object):
         self.max_delta = 60 * 30
 
         self.priorities = {}
+
+        # running objective, updated when a section is left
+        self.objective = 0.0
+        self.train_objective = []
+        self.requirement_objective = []
         # self.blocked_trains = set()
 
+        # polled during run, a long run on a large instance would otherwise outlive the time budget
+        self.should_stop = None
+
+        # handler of each type of event
+        self.handlers = {
+            EnterNodeEvent: self.on_node,
+            ReleaseResourceEvent: self.on_release,
+            EnterStationEvent: self.on_station,
+        }
+
         self.assign_sections_to_resources()
 
     def create_output(self):
@@ -75,6 +123,9 @@ class Simulator(object):
         return output
 
     def assign_sections_to_resources(self):
+        self.free_all_resources()
+        for r in self.resources.values():
+            r.sections = []
         for train in self.trains:
             for section in train.get_sections():
                 for occupation in section.get_occupations():
@@ -83,7 +134,8 @@ class Simulator(object):
                     occupation.resource.sections.append(section)
 
     def initialize(self):
-        self.events = defaultdict(list)
+        self.events.clear()
+        self.journal.clear()
 
         self.done = False
         self.current_time = 0
@@ -95,6 +147,22 @@ class Simulator(object):
             self.register_event(event)
             train.solution = Solution(train=train)
 
+        self.reset_objective()
+
+    def prepare(self):
+        """
+        computes the limits of the nodes, the waiting connections and the overlapping trains.
+        Done once per instance: the prepared instance is saved to cache_dir and loaded from there next time
+        """
+        if self.prepared:
+            return
+        self.assign_limit()
+        self.spiegel_anschlusse()
+        self.match_trains()
+        self.prepared = True
+        if self.cache_dir is not None:
+            instance_cache.save(self.cache_dir, self.path, self.timetable, self.compiled)
+
     def match_trains(self):
         resources = {}
         for train in self.trains:
@@ -113,20 +181,35 @@ class Simulator(object):
         #                   key=lambda t: t.network.nodes["end"].limit - t.network.nodes["start"].limit, reverse=True)
         #       self.priorities[trains_pair] = a
 
+        # inverted index: for each resource, the trains using it sorted by the limit of their end node
+        starts = np.array([t.network.nodes["start"].limit for t in self.trains], dtype=np.float64)
+        stops = np.array([t.network.nodes["end"].limit for t in self.trains], dtype=np.float64)
+        by_resource = defaultdict(list)
         for i, train in enumerate(self.trains):
-            _trains = []
-            start = train.network.nodes["start"].limit
-            stop = train.network.nodes["end"].limit
-            rs = resources[train.get_id()]
-            for _train in self.trains:
-                _rs = resources[_train.get_id()]
-                if len(_rs.intersection(rs)) > 0:
-                    _start = _train.network.nodes["start"].limit
-                    _stop = _train.network.nodes["end"].limit
-
-                    if (start - delta <= _stop <= stop + delta) or (_start - delta <= stop <= _stop + delta):
-                        _trains.append(_train)
-            train.other_trains = _trains
+            for r in resources[train.get_id()]:
+                by_resource[r].append(i)
+        postings = {}
+        for r, trains in by_resource.items():
+            trains = np.array(trains, dtype=np.int64)
+            trains = trains[np.argsort(stops[trains], kind="stable")]
+            postings[r] = (trains, stops[trains])
+
+        for i, train in enumerate(self.trains):
+            start = starts[i]
+            stop = stops[i]
+            # both overlap tests below need the other train to end after min(start, stop) - delta
+            lowest = min(start, stop) - delta
+            candidates = []
+            for r in resources[train.get_id()]:
+                trains, _stops = postings[r]
+                candidates.append(trains[np.searchsorted(_stops, lowest, side="left"):])
+            candidates = np.unique(np.concatenate(candidates)) if candidates else np.empty(0, dtype=np.int64)
+
+            _starts = starts[candidates]
+            _stops = stops[candidates]
+            overlap = ((start - delta <= _stops) & (_stops <= stop + delta)) | \
+                      ((_starts - delta <= stop) & (stop <= _stops + delta))
+            train.other_trains = [self.trains[j] for j in candidates[overlap]]
 
         # is this used?
         # for train in self.trains:
@@ -164,39 +247,77 @@ class Simulator(object):
                 r.waiting_connections = list(con.values())
 
     def compute_score(self):
-        score = 0
-        for train in self.trains:
-            score += train.solution.compute_objective()
-        return score
+        return float(self.compiled.compute_objective([train.solution for train in self.trains]).sum())
+
+    def reset_objective(self):
+        """
+        objective with no section left: every requirement counts as never reached
+        """
+        table = self.compiled.requirement_table
+        missing = 1 / 60.0 * (table["entry_delay_weight"] * np.maximum(0, MAX_TIME - table["entry_latest"]) +
+                              table["exit_delay_weight"] * np.maximum(0, MAX_TIME - table["exit_latest"]))
+        self.requirement_objective = missing.tolist()
+        self.train_objective = np.bincount(table["train"], weights=missing, minlength=len(self.trains)).tolist()
+        self.objective = float(missing.sum())
+
+    def add_to_objective(self, section):
+        """
+        adds the penalty and the delays of a section which has just been left
+        """
+        value = section.calc_penalty()
+        requirement = section.get_requirement()
+        if requirement is not None:
+            delays = value - section.get_penalty()
+            value -= self.requirement_objective[requirement.index]
+            self.journal.record(self.requirement_objective.__setitem__, requirement.index,
+                                self.requirement_objective[requirement.index])
+            self.requirement_objective[requirement.index] = delays
+
+        i = section.train.index
+        self.journal.record(self.train_objective.__setitem__, i, self.train_objective[i])
+        self.journal.record(setattr, self, "objective", self.objective)
+        self.train_objective[i] += value
+        self.objective += value
+
+    def get_train_objective(self, train):
+        return self.train_objective[train.index]
 
     def run_next(self, event):
-        if isinstance(event, EnterNodeEvent):
-            self.on_node(event=event)
-
-        elif isinstance(event, ReleaseResourceEvent):
-            resource = event.resource
-            resource.release(train=event.train, release_time=event.emited_at)
-
-        elif isinstance(event, EnterStationEvent):
-            train = event.train
-            section = event.section
-            duration = section.get_requirement().get_min_stopping_time()
-            earliest_exit = section.get_requirement().get_exit_earliest()
-            time = max(earliest_exit, event.time + duration)
-            next_event = EnterNodeEvent(time=time, train=train, node=section.get_end_node(),
-                                        previous_section=section)
-            self.register_event(next_event)
+        self.handlers[type(event)](event)
+
+    def on_release(self, event):
+        resource = event.resource
+        waiting_events = resource.release(train=event.train, release_time=event.emited_at, journal=self.journal)
+        self.wake_up(waiting_events)
+
+    def on_station(self, event):
+        section = event.section
+        duration = section.get_requirement().get_min_stopping_time()
+        earliest_exit = section.get_requirement().get_exit_earliest()
+        time = max(earliest_exit, event.time + duration)
+        self.register_event(EnterNodeEvent(time, event.train, section.get_end_node(), section))
 
     def run(self):
-        self.current_time = self.min_time
-        while self.current_time < self.max_time + 10:
-            if self.current_time > 60 * 60 * 25:
+        handlers = self.handlers
+        events = self.events
+        should_stop = self.should_stop
+        n = 0
+        # jump from one event time to the next instead of ticking every second
+        while len(events) > 0:
+            n += 1
+            if n % CHECK_INTERVAL == 0:
+                if should_stop is not None and should_stop():
+                    raise StopException()
+                if self.use_journal:
+                    self.journal.trim(self.current_time - self.journal_depth)
+            next_time = events.next_time()
+            if next_time > 60 * 60 * 25:
                 logging.info("breaking")
                 break
-            for event in self.events[self.current_time]:
-                self.run_next(event=event)
-            del self.events[self.current_time]
-            self.current_time += 1
+            self.journal.time = next_time
+            event = events.pop()
+            self.current_time = event.time
+            handlers[type(event)](event)
         self.done = True
         logging.info("Done %s" % self.compute_score())
 
@@ -212,14 +333,60 @@ class Simulator(object):
         if self.late_on_node:
             return self.is_late_on_node(event)
         else:
-            ts = event.train.network.nodes["start"].limit
-            tf = event.train.network.nodes["end"].limit
-            tc = event.node.limit
-            delta = np.interp(tc, [ts, tf], [self.min_delta, self.max_delta])
-            return event.time > event.node.limit + delta
+            return event.time > self.late_time(event)
+
+    def late_time(self, event):
+        """
+        time after which is_late is True for the event
+        """
+        if self.late_on_node:
+            section = event.previous_section
+            if section is None:
+                return np.inf
+            return section.nominal_exit_time() + self.max_delta
+        ts = event.train.network.nodes["start"].limit
+        tf = event.train.network.nodes["end"].limit
+        tc = event.node.limit
+        delta = np.interp(tc, [ts, tf], [self.min_delta, self.max_delta])
+        return event.node.limit + delta
+
+    def wait_for_release(self, links, event):
+        """
+        subscribes the event on the resources blocking the links.
+        The event is also planned at the time the train becomes late, so that avoid rules can still be created
+        """
+        resources = set([r for link in links for r in link.get_resources() if not r.is_free_for(event.train)])
+        for r in resources:
+            r.subscribe(event, journal=self.journal)
+        self.journal.record(setattr, event, "waiting_on", event.waiting_on)
+        event.waiting_on = list(resources)
+
+        late_time = self.late_time(event)
+        if event.time <= late_time:
+            deadline = np.floor(late_time) + 1
+        else:
+            deadline = event.time + self.wait_time
+        if deadline < 24 * 60 * 60:
+            event.time = deadline
+            self.register_event(event)
+
+    def stop_waiting(self, event):
+        if len(event.waiting_on) == 0:
+            return
+        for r in event.waiting_on:
+            r.unsubscribe(event, journal=self.journal)
+        self.journal.record(setattr, event, "waiting_on", event.waiting_on)
+        event.waiting_on = []
+
+    def wake_up(self, events):
+        for event in events:
+            self.stop_waiting(event)
+            event.time = self.current_time
+            self.register_event(event)
 
     def on_node(self, event):
         train = event.train
+        self.stop_waiting(event)
         section = train.solution.get_current_section()
         all_links = event.node.out_links
 
@@ -273,7 +440,7 @@ class Simulator(object):
         if self.check_if_free(free_links, links_without_avoid, event):
             return
 
-        state = get_state_id(train, self.n_state)
+        state = self.qtable.intern_state(self.state_id(train))
         link = self.qtable.get_action(free_links, state)
 
         # can I already enter this link?
@@ -284,11 +451,17 @@ class Simulator(object):
         self.go_to_section(from_section=section, to_section=to_section, at=event.time)
 
         train.solution.save_states(section=to_section, state=state)
+        self.journal.record(train.solution.remove_last_state)
+        self.wake_connections(train, to_section)
         self.update(train=event.train, state=state, time=event.time)
 
+    def state_id(self, train):
+        return get_state_id(train, self.n_state)
+
     def if_at_end(self, section, event):
         if event.node.label == "end":
-            state = get_state_id(event.train, self.n_state)
+            state = self.qtable.intern_state(self.state_id(event.train))
+            self.journal.record(setattr, event.train.solution, "done", False)
             event.train.solution.done = True
             self.go_to_section(from_section=section, to_section=None, at=event.time)
             self.update(train=event.train, state=state, time=event.time)
@@ -314,8 +487,11 @@ class Simulator(object):
                 a = self.priorities[trains_pair]
                 self.avoid(a[0], a[1], event)
 
-            event.time += self.wait_time
-            self.register_event(event)
+            if self.wake_on_release:
+                self.wait_for_release(links, event)
+            else:
+                event.time += self.wait_time
+                self.register_event(event)
 
             return True
 
@@ -333,25 +509,43 @@ class Simulator(object):
                 for c in r.waiting_connections:
                     connecting_train = c.from_train
                     marker = c.from_section_marker
-                    _s = None
-                    for c_s in connecting_train.solution.sections:
-                        if c_s.get_marker() == marker:
-                            _s = c_s
-                            break
+                    _s = connecting_train.solution.get_section_by_marker(marker)
                     if _s is None:
                         # conencting train did not yet arrived. Need to wait..
-                        event.time += self.wait_time
-                        self.register_event(event)
+                        if self.wake_on_connection:
+                            waiters = connecting_train.solution.connection_waiters[marker]
+                            waiters.append((event, c.min_connection_time))
+                            self.journal.record(waiters.pop)
+                        else:
+                            event.time += self.wait_time
+                            self.register_event(event)
                         return True
                     else:
                         # connection train is or has been on the section, check min time
                         should_wait = event.time - _s.entry_time < c.min_connection_time
                         if should_wait:
-                            event.time += self.wait_time
+                            if self.wake_on_connection:
+                                event.time = _s.entry_time + c.min_connection_time
+                            else:
+                                event.time += self.wait_time
                             self.register_event(event)
                             return True
         return False
 
+    def wake_connections(self, train, section):
+        """
+        plans the events of the trains waiting for train to enter section
+        """
+        marker = section.get_marker()
+        connection_waiters = train.solution.connection_waiters
+        if marker is None or marker not in connection_waiters:
+            return
+        waiters = connection_waiters.pop(marker)
+        self.journal.record(connection_waiters.__setitem__, marker, waiters)
+        for event, min_connection_time in waiters:
+            event.time = section.entry_time + min_connection_time
+            self.register_event(event)
+
     def remove_link_to_avoid(self, links, train):
         _links = []
         trains_are_on = [t.solution.sections[-1].section for t in train.other_trains if len(t.solution.sections) > 0]
@@ -386,10 +580,7 @@ class Simulator(object):
 
     def free_all_resources(self):
         for r in self.resources.values():
-            r.free = True
-            r.currently_used_by = None
-            r.last_exit_time = None
-            r.last_used_by = None
+            r.reset()
 
     def update(self, train, state, time):
         if len(train.solution.sections) > 1:
@@ -412,19 +603,20 @@ class Simulator(object):
 
         # release previous section
         if from_section is not None:
+            self.journal.record(setattr, from_section, "exit_time", from_section.exit_time)
             from_section.exit_time = at
+            self.add_to_objective(from_section)
             from_resources = set(from_section.get_resources())
             to_resources = set(to_resources)
             for from_r in from_resources.difference(to_resources):
                 release_at = at + from_r.get_release_time()
-                from_r.exit(train=train, at=at)
+                from_r.exit(train=train, at=at, journal=self.journal)
 
-                next_event = ReleaseResourceEvent(train=train, time=release_at, emited_at=at, resource=from_r)
-                self.register_event(next_event)
+                self.register_event(ReleaseResourceEvent(release_at, train, from_r, at))
 
         # block next section
         for to_r in to_resources:
-            to_r.enter(train=to_section.train, at=at)
+            to_r.enter(train=to_section.train, at=at, journal=self.journal)
 
         if to_section is not None:
             self.register_event(self.next_event_for_train(to_section=to_section, at=at))
@@ -438,10 +630,9 @@ class Simulator(object):
             earliest_entry = to_section.get_requirement().get_entry_earliest()
             # this test should be done before
             time = max(earliest_entry, next_time)
-            return EnterStationEvent(time=time, section=to_section, train=train)
+            return EnterStationEvent(time, train, to_section)
         else:
-            return EnterNodeEvent(time=next_time, train=train, node=to_section.get_end_node(),
-                                  previous_section=to_section)
+            return EnterNodeEvent(next_time, train, to_section.get_end_node(), to_section)
 
     def register_event(self, event):
         assert event.time != np.inf
@@ -454,7 +645,28 @@ class Simulator(object):
             humanize_time(self.current_time), humanize_time(event.time))
         self.min_time = min(self.min_time, event.time)
         self.max_time = max(self.max_time, event.time)
-        self.events[event.time].append(event)
+        self.events.push(event)
+
+    def get_qtable_path(self, folder):
+        return os.path.join(folder, str(self.timetable.hash), self.qtable.layout)
+
+    def save_qtable(self, folder):
+        self.qtable.save(self.get_qtable_path(folder), instance_hash=self.timetable.hash)
+
+    def load_qtable(self, folder):
+        """
+        warm starts the qtable from a previous run on the same problem instance, if any
+        """
+        path = self.get_qtable_path(folder)
+        if not os.path.exists(path):
+            return False
+        try:
+            self.qtable.load(path, sections=self.compiled.sections, instance_hash=self.timetable.hash)
+        except ValueError as e:
+            logging.warning("qtable not loaded: %s" % e)
+            return False
+        logging.info("qtable loaded from %s" % path)
+        return True
 
     def get_train(self, name):
         for train in self.trains:
@@ -462,13 +674,35 @@ class Simulator(object):
                 return train
 
     def go_back(self, time):
+        """
+        sets the simulation back to time.
+        With the journal only the changes made after time are undone, otherwise, or when the journal has been
+        trimmed past time, the state is rebuilt from the solutions of all the trains
+        """
+        assert time < np.inf
+
+        if self.use_journal and time >= self.journal.horizon:
+            self.journal.undo_after(time)
+            self.current_time = time
+            return
+
+        self.rebuild(time)
+        self.journal.clear(time)
+
+        self.reset_objective()
+        for train in self.trains:
+            for section in train.solution.sections:
+                if section.exit_time < np.inf:
+                    self.add_to_objective(section)
+
+    def rebuild(self, time):
         # self.blocked_trains = set()
         self.min_time = 9999999
         self.max_time = 0
 
         self.free_all_resources()
 
-        self.events = defaultdict(list)
+        self.events.clear()
         self.current_time = time
 
         assert time < np.inf
@@ -546,3 +780,5 @@ class Simulator(object):
             train.solution.sections = _sections
             train.solution.states = _states
             train.solution.other_trains_sections = _other_trains_sections
+            train.solution.remove_markers_after(time)
+            train.solution.connection_waiters.clear()
@@ -0,0 +1,121 @@
+import json
+import time
+from collections import defaultdict
+
+from simulator.simulator import BlockinException
+
+# methods of the Simulator returning True when the event is planned again to wait, by cause
+WAIT_CAUSES = [
+    ("check_if_free", "no_free_link"),
+    ("check_connections", "connection"),
+    ("check_earliest_entry", "earliest_entry"),
+]
+
+
+class Stats(object):
+    """
+    counters and timers of a Simulator.
+    They are attached by wrapping methods of the simulator instance, so that a detached simulator runs its own
+    code untouched
+    """
+
+    def __init__(self):
+        self.counters = defaultdict(int)
+        self.timers = defaultdict(float)
+        self.maxima = defaultdict(float)
+        self.wrapped = []
+
+    def reset(self):
+        self.counters.clear()
+        self.timers.clear()
+        self.maxima.clear()
+
+    def to_dict(self):
+        return {"counters": dict(self.counters), "timers": dict(self.timers), "maxima": dict(self.maxima)}
+
+    def dump(self, f, **info):
+        """
+        writes the stats as one line of JSON, with info
+        """
+        record = dict(info)
+        record.update(self.to_dict())
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+
+    def timed(self, name, function):
+        counters = self.counters
+        timers = self.timers
+
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timers[name] += time.perf_counter() - start
+                counters[name] += 1
+        return wrapper
+
+    def wrap(self, obj, name, wrapper):
+        self.wrapped.append((obj, name))
+        setattr(obj, name, wrapper)
+
+    def attach(self, sim):
+        counters = self.counters
+        maxima = self.maxima
+
+        self.handlers = sim.handlers
+        sim.handlers = {kind: self.timed("event.%s" % kind.__name__, handler)
+                        for kind, handler in sim.handlers.items()}
+
+        for method, cause in WAIT_CAUSES:
+            self.wrap(sim, method, self.counted_wait(getattr(sim, method), cause))
+
+        remove_link_to_avoid = self.timed("remove_link_to_avoid", sim.remove_link_to_avoid)
+
+        def avoid_wrapper(links, train):
+            _links = remove_link_to_avoid(links, train)
+            # on_node waits when the avoid rules leave no link
+            if len(_links) == 0:
+                counters["wait.avoid_rule"] += 1
+            return _links
+        self.wrap(sim, "remove_link_to_avoid", avoid_wrapper)
+
+        self.wrap(sim, "state_id", self.timed("get_state_id", sim.state_id))
+        self.wrap(sim.qtable, "update_table", self.timed("update_table", sim.qtable.update_table))
+
+        run = sim.run
+
+        def run_wrapper():
+            try:
+                return run()
+            except BlockinException:
+                counters["blocking"] += 1
+                raise
+        self.wrap(sim, "run", run_wrapper)
+
+        go_back = self.timed("go_back", sim.go_back)
+
+        def go_back_wrapper(time):
+            depth = sim.current_time - time
+            n_entries = len(sim.journal)
+            go_back(time)
+            counters["rollback_seconds"] += depth
+            counters["rollback_entries"] += n_entries - len(sim.journal)
+            maxima["rollback_seconds"] = max(maxima["rollback_seconds"], depth)
+        self.wrap(sim, "go_back", go_back_wrapper)
+
+    def counted_wait(self, function, cause):
+        counters = self.counters
+
+        def wrapper(*args, **kwargs):
+            waiting = function(*args, **kwargs)
+            if waiting:
+                counters["wait.%s" % cause] += 1
+            return waiting
+        return wrapper
+
+    def detach(self, sim):
+        sim.handlers = self.handlers
+        for obj, name in self.wrapped:
+            delattr(obj, name)
+        self.wrapped = []
@@ -0,0 +1,148 @@
+import logging
+import glob
+import os
+import csv
+import random
+import time
+import itertools
+import argparse
+import multiprocessing
+
+from main import create_simulator, run_episodes, get_parser
+from simulator.qtable import QTable
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+FORMAT = "[%(asctime)s %(filename)s:%(lineno)s - %(funcName)s ] %(message)s"
+logging.basicConfig(format=FORMAT)
+
+# the knobs of main.py which are swept, with their type
+PARAMETERS = [("epsilon", float), ("alpha", float), ("gamma", float), ("wait", int),
+              ("max_delta", int), ("min_delta", int), ("n_state", int)]
+
+
+def grid_configs(values):
+    """
+    all the combinations of the values of each parameter
+    """
+    names = [name for name, _ in PARAMETERS]
+    return [dict(zip(names, combination)) for combination in itertools.product(*[values[name] for name in names])]
+
+
+def random_configs(values, n, rng):
+    """
+    n configurations, each parameter drawn uniformly among its values
+    """
+    configs = []
+    for _ in range(n):
+        configs.append({name: rng.choice(values[name]) for name, _ in PARAMETERS})
+    return configs
+
+
+def run_config(path, config_id, config, seed, time_budget, n_episodes, cache_dir):
+    """
+    runs one configuration on one instance in this process, returns its score over time as (seconds, score) pairs
+    """
+    args = get_parser().parse_args([])
+    args.cache_dir = cache_dir
+    for name, value in config.items():
+        setattr(args, name, value)
+
+    start_time = time.time()
+    sim = create_simulator(path, args, QTable())
+    random.seed(seed)
+    trace = []
+
+    def report(score):
+        trace.append((time.time() - start_time, score))
+
+    def should_stop():
+        return (time.time() - start_time) > time_budget
+
+    # errors are recorded as an empty trace, they should not stop the sweep
+    try:
+        run_episodes(sim, report=report, should_stop=should_stop, n_episodes=n_episodes)
+    except Exception as e:
+        logging.warning("%s config %i failed: %r" % (path, config_id, e))
+    return path, config_id, seed, trace
+
+
+def best_score(trace):
+    return trace[-1][1] if trace else float("inf")
+
+
+def write_results(results_path, configs, results):
+    names = [name for name, _ in PARAMETERS]
+    with open(results_path, 'w', newline='') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(["instance", "config"] + names + ["seed", "seconds", "score"])
+        for path, config_id, seed, trace in results:
+            config = [configs[config_id][name] for name in names]
+            for seconds, score in trace:
+                writer.writerow([os.path.basename(path), config_id] + config + [seed, "%.3f" % seconds, score])
+
+
+def report_best(configs, results):
+    """
+    logs the best configuration of each instance: lowest mean best score over the seeds, then the fastest
+    """
+    by_instance = {}
+    for path, config_id, seed, trace in results:
+        scores = by_instance.setdefault(path, {}).setdefault(config_id, [])
+        scores.append((best_score(trace), trace[-1][0] if trace else float("inf")))
+
+    best = {}
+    for path, by_config in sorted(by_instance.items()):
+        def key(config_id):
+            scores = by_config[config_id]
+            return (sum(s for s, _ in scores) / len(scores), sum(t for _, t in scores) / len(scores))
+        config_id = min(by_config, key=key)
+        best[path] = config_id
+        score, seconds = key(config_id)
+        logging.info("%s: best config %i %s, score %f after %.1fs" % (
+            os.path.basename(path), config_id, configs[config_id], score, seconds))
+    return best
+
+
+def get_sweep_parser():
+    defaults = get_parser().parse_args([])
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nos", default="01,02", help="comma separated instance numbers")
+    for name, _ in PARAMETERS:
+        parser.add_argument("--" + name, default=str(getattr(defaults, name)), help="comma separated values")
+    parser.add_argument("--random", default=0, type=int, help="number of random configurations, 0 for the full grid")
+    parser.add_argument("--seeds", default=1, type=int, help="seeds per configuration")
+    parser.add_argument("--seed", default=defaults.seed, type=int)
+    parser.add_argument("--time_budget", default=60, type=float, help="seconds per run")
+    parser.add_argument("--n_episodes", default=200, type=int)
+    parser.add_argument("--processes", default=multiprocessing.cpu_count(), type=int)
+    parser.add_argument("--cache_dir", default=None, help="folder to cache the prepared problem instances in")
+    parser.add_argument("--output", default="outputs/sweep.csv")
+    return parser
+
+
+if __name__ == "__main__":
+    args = get_sweep_parser().parse_args()
+
+    values = {name: [cast(v) for v in getattr(args, name).split(",")] for name, cast in PARAMETERS}
+    if args.random > 0:
+        configs = random_configs(values, args.random, random.Random(args.seed))
+    else:
+        configs = grid_configs(values)
+
+    paths = [glob.glob(r"inputs/" + no + "*")[0] for no in args.nos.split(",")]
+    tasks = [(path, config_id, config, args.seed + k, args.time_budget, args.n_episodes, args.cache_dir)
+             for path in paths
+             for config_id, config in enumerate(configs)
+             for k in range(args.seeds)]
+    logging.info("%i configurations, %i runs" % (len(configs), len(tasks)))
+
+    with multiprocessing.Pool(processes=args.processes) as pool:
+        results = pool.starmap(run_config, tasks)
+
+    output_folder = os.path.dirname(args.output)
+    if output_folder:
+        os.makedirs(output_folder, exist_ok=True)
+    write_results(args.output, configs, results)
+    report_best(configs, results)
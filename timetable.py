@@ -1,7 +1,70 @@
+import gc
 import json
 from trains.train import Train
 from resources.resource import Resource
 from routes.route import Route
+from compiled_timetable import CompiledTimetable
+
+# optional faster parsers: ijson streams the file item by item, orjson parses the whole file faster than json
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ITEM_LISTS = ["resources", "routes", "service_intentions"]
+
+
+def read_items(json_path):
+    """
+    yields (key, value) pairs of a problem instance in file order, one pair per item of the resources, routes
+    and service_intentions lists. With ijson only one item is in memory at a time, otherwise the items of the
+    parsed file are released once yielded
+    """
+    if ijson is not None:
+        for pair in stream_items(json_path):
+            yield pair
+        return
+
+    with open(json_path, "rb") as f:
+        data = orjson.loads(f.read()) if orjson is not None else json.load(f)
+
+    for key in list(data):
+        value = data.pop(key)
+        if key in ITEM_LISTS:
+            value.reverse()
+            while value:
+                yield key, value.pop()
+        else:
+            yield key, value
+
+
+def stream_items(json_path):
+    prefixes = {key + ".item": key for key in ITEM_LISTS}
+    with open(json_path, "rb") as f:
+        builder = None
+        depth = 0
+        for prefix, event, value in ijson.parse(f, use_float=True):
+            if builder is not None:
+                builder.event(event, value)
+                if event in ("start_map", "start_array"):
+                    depth += 1
+                elif event in ("end_map", "end_array"):
+                    depth -= 1
+                if depth == 0:
+                    yield key, builder.value
+                    builder = None
+            elif prefix in prefixes and event in ("start_map", "start_array"):
+                key = prefixes[prefix]
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+                depth = 1
+            elif "." not in prefix and event not in ("start_map", "map_key", "end_map", "start_array", "end_array"):
+                yield prefix, value
 
 
 class Timetable(object):
@@ -9,28 +72,49 @@ class Timetable(object):
         self.trains = {}
         self.routes = {}
         self.resources = {}
-        self.data = None
-
-        with open(json_path) as f:
-            data = json.load(f)
-            self.data = data
-            self.label = data["label"]
-            self.hash = data["hash"]
+        self.label = None
+        self.hash = None
 
-            for d in data["resources"]:
-                self.add_resource(Resource(data=d))
+        # loading only allocates objects which live as long as the timetable, the cyclic garbage collector would
+        # scan the growing heap again and again for nothing
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self.read(json_path)
+        finally:
+            if enabled:
+                gc.enable()
 
-            routes = {}
-            for d in data["routes"]:
-                routes[d["id"]] = d
-
-            for d in data["service_intentions"]:
-                train = self.add_train(Train(data=d))
-                train.network.add_route(Route(data=routes[train.get_id()], train=train))
+    def read(self, json_path):
+        # routes read before their service intention
+        routes = {}
+        for key, value in read_items(json_path):
+            if key == "label":
+                self.label = value
+            elif key == "hash":
+                self.hash = value
+            elif key == "resources":
+                self.add_resource(Resource(data=value))
+            elif key == "service_intentions":
+                train = self.add_train(Train(data=value))
+                if train.get_id() in routes:
+                    self.add_route(routes.pop(train.get_id()))
+            elif key == "routes":
+                if value["id"] in self.trains:
+                    self.add_route(value)
+                else:
+                    routes[value["id"]] = value
 
     def add_train(self, train):
         self.trains[train.get_id()] = train
         return train
 
+    def add_route(self, data):
+        train = self.trains[data["id"]]
+        train.network.add_route(Route(data=data, train=train))
+
     def add_resource(self, resource):
         self.resources[resource.get_id()] = resource
+
+    def compile(self):
+        return CompiledTimetable(self)
@@ -3,25 +3,29 @@ import isodate
 
 class Connection(object):
     def __init__(self, data):
-        self._data = data
-        self.min_connection_time = isodate.parse_duration(self._data["min_connection_time"]).seconds
+        self.id = data["id"]
+        self.onto_service_intention = data["onto_service_intention"]
+        self.onto_section_marker = data["onto_section_marker"]
+        self.min_connection_time = isodate.parse_duration(data["min_connection_time"]).seconds
 
     def get_id(self):
-        return self._data["id"]
+        return self.id
 
     def get_onto_service_intention(self):
         """reference to the service_intention that accepts the connection"""
-        return self._data["onto_service_intention"]
+        return self.onto_service_intention
 
     def get_onto_section_marker(self):
         """reference to a section marker. Specifies which route_sections in the onto_service_intention are candidates to fulfil the connection"""
-        return self._data["onto_section_marker"]
+        return self.onto_section_marker
 
     def get_min_connection_time(self):
         return self.min_connection_time
 
 
 class WaitingConnection(object):
+    __slots__ = ("from_train", "from_section_marker", "min_connection_time")
+
     def __init__(self, from_train, from_section_marker, min_time):
         self.from_train = from_train
         self.from_section_marker = from_section_marker
@@ -11,16 +11,34 @@ from trains.connection import Connection
 
 
 class Requirement(object):
+    # index is set by CompiledTimetable
+    __slots__ = ("train", "waiting_connections", "type", "section_marker", "sequence_number", "entry_delay_weight",
+                 "exit_delay_weight", "min_stopping_time", "entry_earliest", "exit_earliest", "entry_latest",
+                 "exit_latest", "connections", "index")
 
     def __init__(self, data, train):
-        self._data = data
         self.train = train
         self.waiting_connections = []
+        self.type = data["type"]
+        self.section_marker = data["section_marker"]
+        self.sequence_number = data["sequence_number"]
+        self.entry_delay_weight = data.get("entry_delay_weight", 0.0)
+        self.exit_delay_weight = data.get("exit_delay_weight", 0.0)
         self.min_stopping_time = 0.0
 
         key = "min_stopping_time"
-        if key in self._data:
-            self.min_stopping_time = isodate.parse_duration(self._data["min_stopping_time"]).seconds
+        if key in data:
+            self.min_stopping_time = isodate.parse_duration(data["min_stopping_time"]).seconds
+
+        # times are parsed once, the getters are called at every move
+        self.entry_earliest = parse_time(data, "entry_earliest", default=0.0)
+        self.exit_earliest = parse_time(data, "exit_earliest", default=0.0)
+        self.entry_latest = parse_time(data, "entry_latest", default=24 * 60 * 60 * 3)
+        self.exit_latest = parse_time(data, "exit_latest", default=24 * 60 * 60 * 3)
+
+        self.connections = []
+        if data.get("connections") is not None:
+            self.connections = [Connection(c) for c in data["connections"] if c is not None]
 
     @staticmethod
     def factory(data, **kwargs):
@@ -37,59 +55,37 @@ class Requirement(object):
     def get_type(self):
         """a text field describing what this requirement is meant to represent, such as start of a train, a scheduled stop, etc. Has no effect on processing. You may ignore it.
         """
-        return self._data["type"]
+        return self.type
 
     def get_section_marker(self):
-        return self._data["section_marker"]
+        return self.section_marker
 
     def get_sequence_number(self):
-        return self._data["sequence_number"]
+        return self.sequence_number
 
     def get_min_stopping_time(self):
         return self.min_stopping_time
 
     def get_entry_earliest(self):
-        key = "entry_earliest"
-        if key in self._data:
-            return to_sec(self._data[key])
-        return 0.0
+        return self.entry_earliest
 
     def get_exit_earliest(self):
-        key = "exit_earliest"
-        if key in self._data:
-            return to_sec(self._data[key])
-        return 0.0
+        return self.exit_earliest
 
     def get_entry_latest(self):
-        key = "entry_latest"
-        if key in self._data:
-            return to_sec(self._data[key])
-        return 24 * 60 * 60 * 3
+        return self.entry_latest
 
     def get_exit_latest(self):
-        key = "exit_latest"
-        if key in self._data:
-            return to_sec(self._data[key])
-        return 24 * 60 * 60 * 3
+        return self.exit_latest
 
     def get_connections(self):
-        if "connections" not in self._data:
-            return []
-        if self._data["connections"] is None:
-            return []
-        return [Connection(c) for c in self._data["connections"] if c is not None]
+        return self.connections
 
     def get_entry_delay_weight(self):
-        key = "entry_delay_weight"
-        if key in self._data:
-            return self._data[key]
-        return 0.0
+        return self.entry_delay_weight
 
     def get_exit_delay_weight(self):
-        key = "exit_delay_weight"
-        if key in self._data:
-            return self._data[key]
-        return 0.0
+        return self.exit_delay_weight
 
     def __str__(self):
         return "Halt:  %s<->%s (%s) %s<->%s" % (humanize_time(self.get_entry_earliest()),
@@ -100,20 +96,32 @@ class Requirement(object):
 
 
 class StartRequirement(Requirement):
+    __slots__ = ()
+
     def __init__(self, **kwargs):
         Requirement.__init__(self, **kwargs)
 
 
 class HaltRequirement(Requirement):
+    __slots__ = ()
+
     def __init__(self, **kwargs):
         Requirement.__init__(self, **kwargs)
 
 
 class EndeRequirement(Requirement):
+    __slots__ = ()
+
     def __init__(self, **kwargs):
         Requirement.__init__(self, **kwargs)
 
 
+def parse_time(data, key, default):
+    if key in data:
+        return to_sec(data[key])
+    return default
+
+
 def to_sec(txt):
     a = txt.split(":")
     return int(a[0]) * 60 * 60 + int(a[1]) * 60 + int(a[2])
@@ -1,10 +1,13 @@
 from simulator.event import humanize_time
+from collections import defaultdict
 import numpy as np
 
 MAX_TIME = 24 * 60 * 60
 
 
 class SectionSolution(object):
+    __slots__ = ("section", "entry_time", "exit_time", "train")
+
     def __init__(self, section):
         self.section = section
         self.entry_time = np.inf
@@ -74,12 +77,37 @@ class Solution(object):
 
         self.states = [None]
 
+        # first section solution for each section marker
+        self.sections_by_marker = {}
+        self.index_section(c_section)
+        # events of other trains waiting on a connection, by section marker
+        self.connection_waiters = defaultdict(list)
+
     def __str__(self):
         return "%s : %s" % (self.train, "->".join(self.sections))
 
     def get_current_section(self):
         return self.sections[-1]
 
+    def get_section_by_marker(self, marker):
+        return self.sections_by_marker.get(marker)
+
+    def index_section(self, section):
+        marker = section.get_marker()
+        if marker is not None and marker not in self.sections_by_marker:
+            self.sections_by_marker[marker] = section
+
+    def remove_last_state(self):
+        section = self.sections.pop()
+        self.states.pop()
+        self.other_trains_sections.pop()
+        marker = section.get_marker()
+        if self.sections_by_marker.get(marker) is section:
+            del self.sections_by_marker[marker]
+
+    def remove_markers_after(self, time):
+        self.sections_by_marker = {m: s for m, s in self.sections_by_marker.items() if s.entry_time <= time}
+
     def compute_objective(self):
         value = 0.0
 
@@ -130,3 +158,4 @@ class Solution(object):
         self.other_trains_sections.append(
             {t: t.solution.sections[-1] for t in self.train.other_trains if len(t.solution.sections) > 0})
         self.states.append(state)
+        self.index_section(section)
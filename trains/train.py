@@ -8,13 +8,17 @@ import numpy as np
 
 class Train(object):
     def __init__(self, data):
-        self._data = data
         self.network = Network()
         self.solution = None
-        self.requirements = None
-        self.id = self._data["id"]
+        self.id = data["id"]
         self.hash = hash(self.get_id())
         self.int_id = 0
+        self.requirements = sorted([Requirement.factory(data=d, train=self) for d in data["section_requirements"]],
+                                   key=lambda x: x.get_sequence_number())
+        # first requirement of each section marker
+        self.requirements_by_marker = {}
+        for r in self.requirements:
+            self.requirements_by_marker.setdefault(r.get_section_marker(), r)
 
     def get_id(self):
         return self.id
@@ -46,13 +50,11 @@ class Train(object):
         sorted list of requirements
         :return:
         """
-
-        if self.requirements is None:
-            self.requirements = sorted(
-                [Requirement.factory(data=d, train=self) for d in self._data["section_requirements"]],
-                key=lambda x: x.get_sequence_number())
         return self.requirements
 
+    def get_requirement(self, marker):
+        return self.requirements_by_marker.get(marker)
+
     def get_start_event(self):
         requirement = self.get_requirements()[0]
         return EnterNodeEvent(train=self, node=self.get_first_node(), time=requirement.get_entry_earliest(),